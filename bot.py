@@ -1,7 +1,10 @@
-from functools import cache
+from collections import defaultdict
+from typing import Iterable
 from discord import (
-    Activity, ActivityType, AllowedMentions, ChannelType, Message, Intents, User
+    Activity, ActivityType, AllowedMentions, ChannelType, Member, Message,
+    Intents, User
 )
+from discord.abc import GuildChannel
 import discord
 from discord.ext import commands
 from discord.ext import tasks
@@ -13,9 +16,18 @@ import os
 import logging
 import aiohttp
 from async_lru import alru_cache
-from utils import ParrotMarkov, regex, tag
+from utils import BackfillScheduler, ParrotMarkov, regex, tag
+from utils.image_workers import ImageWorkerPool
+from utils.member_cache import MemberCache
+from utils.recent_speakers import RecentSpeakers
 from database.corpus_manager import CorpusManager
 from database.avatar_manager import AvatarManager
+from database.checkpoint_manager import CheckpointManager
+from database.guild_settings_manager import GuildSettingsManager
+from database.imitation_log_manager import ImitationLogManager
+from database.member_index_manager import MemberIndexManager
+from database.webhook_manager import WebhookManager
+from utils.send_scheduler import SendScheduler
 
 
 class Parrot(commands.AutoShardedBot):
@@ -33,6 +45,17 @@ class Parrot(commands.AutoShardedBot):
         intents.message_content = True  # For learning
         intents.members = config.ENABLE_IMITATE_SOMEONE
 
+        # Parrot reads Discord's rate limit headers off of every response to
+        # pace its own requests.
+        http_trace = aiohttp.TraceConfig()
+
+        # Lines up Quickstart jobs and paces their history requests.
+        self.backfill = BackfillScheduler(
+            max_jobs=config.QUICKSTART_MAX_JOBS,
+            max_fetches=config.QUICKSTART_CONCURRENCY,
+        )
+        http_trace.on_request_end.append(self.backfill.on_request_end)
+
         super().__init__(
             command_prefix=prefix,
             owner_ids=admin_user_ids,
@@ -43,9 +66,12 @@ class Parrot(commands.AutoShardedBot):
                 type=ActivityType.listening,
             ),
             intents=intents,
+            http_trace=http_trace,
         )
 
         self.admin_role_ids = admin_role_ids or []
+        self.member_cache = MemberCache()
+        self.recent_speakers = RecentSpeakers()
         self.finished_initializing = False
         self.con = sqlite3.connect(db_path)
         self.db = self.con.cursor()
@@ -68,6 +94,12 @@ class Parrot(commands.AutoShardedBot):
                 webhook_id     INTEGER
             );
 
+            CREATE TABLE IF NOT EXISTS webhooks (
+                id         INTEGER PRIMARY KEY,
+                channel_id INTEGER NOT NULL REFERENCES channels(id),
+                token      TEXT
+            );
+
             CREATE TABLE IF NOT EXISTS messages (
                 id        INTEGER PRIMARY KEY,
                 user_id   INTEGER NOT NULL REFERENCES users(id),
@@ -75,15 +107,75 @@ class Parrot(commands.AutoShardedBot):
                 content   TEXT    NOT NULL
             );
 
+            CREATE TABLE IF NOT EXISTS imitations (
+                message_id INTEGER PRIMARY KEY,
+                user_id    INTEGER NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS avatar_store_orphans (
+                message_id INTEGER PRIMARY KEY
+            );
+
+            CREATE TABLE IF NOT EXISTS quickstart_checkpoints (
+                user_id    INTEGER NOT NULL REFERENCES users(id),
+                channel_id INTEGER NOT NULL REFERENCES channels(id),
+                oldest_id  INTEGER NOT NULL,
+                newest_id  INTEGER NOT NULL,
+                complete   INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, channel_id)
+            );
+
             CREATE TABLE IF NOT EXISTS guilds (
                 id INTEGER PRIMARY KEY,
                 imitation_prefix TEXT NOT NULL DEFAULT "Not ",
                 imitation_suffix TEXT NOT NULL DEFAULT ""
             );
+
+            CREATE TABLE IF NOT EXISTS guild_members (
+                guild_id INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL REFERENCES users(id),
+                PRIMARY KEY (guild_id, user_id)
+            );
             COMMIT;
             """
         )
 
+        # Databases from before channels could have more than one webhook.
+        # channels.webhook_id is no longer used.
+        res = self.db.execute("PRAGMA table_info(channels)")
+        has_tokens = "webhook_token" in {row[1] for row in res.fetchall()}
+        self.db.execute(
+            f"""
+            INSERT OR IGNORE INTO webhooks (id, channel_id, token)
+            SELECT webhook_id, id, {"webhook_token" if has_tokens else "NULL"}
+            FROM channels
+            WHERE webhook_id IS NOT NULL
+            """
+        )
+        self.db.execute(
+            "UPDATE channels SET webhook_id = NULL WHERE webhook_id IS NOT NULL"
+        )
+        self.con.commit()
+
+        self.guild_settings = GuildSettingsManager(db=self.db)
+        self.imitation_log = ImitationLogManager(db=self.db)
+        # Who "imitate someone" can pick from in each guild.
+        self.member_index = MemberIndexManager(db=self.db)
+
+        # Webhooks to imitate through, a few per channel.
+        self.webhooks = WebhookManager(
+            db=self.db,
+            client=self,
+            max_per_channel=config.WEBHOOKS_PER_CHANNEL,
+        )
+        http_trace.on_request_end.append(self.webhooks.on_request_end)
+        # Lines up imitations to go out through those webhooks.
+        self.send_scheduler = SendScheduler(
+            webhooks=self.webhooks,
+            max_queued=config.IMITATE_QUEUE_DEPTH,
+            max_wait=config.IMITATE_MAX_WAIT_SECONDS,
+        )
+
         self.update_learning_channels()
         self.update_speaking_channels()
         self.update_registered_users()
@@ -97,6 +189,7 @@ class Parrot(commands.AutoShardedBot):
         self.autosave.cancel()
         await self.close()
         await self.autosave()
+        self.image_workers.shutdown()
         logging.info("Closing HTTP session...")
         await self.http_session.close()
         logging.info("HTTP session closed.")
@@ -134,11 +227,17 @@ class Parrot(commands.AutoShardedBot):
             get_registered_users=self.get_registered_users,
             command_prefix=self.command_prefix,
         )
+        self.checkpoints = CheckpointManager(db=self.db)
+        self.image_workers = ImageWorkerPool(
+            max_workers=config.IMAGE_WORKERS,
+            max_queued=config.IMAGE_QUEUE_DEPTH,
+        )
         self.avatars = AvatarManager(
             loop=self.loop,
             db=self.db,
             http_session=self.http_session,
             fetch_channel=self.fetch_channel,
+            image_workers=self.image_workers,
         )
 
         self.autosave.start()
@@ -169,6 +268,7 @@ class Parrot(commands.AutoShardedBot):
     @tasks.loop(seconds=config.AUTOSAVE_INTERVAL_SECONDS)
     async def autosave(self) -> None:
         logging.info("Saving database...")
+        self.imitation_log.prune()
         self.con.commit()
         logging.info("Save complete.")
 
@@ -180,6 +280,15 @@ class Parrot(commands.AutoShardedBot):
         return await ParrotMarkov.new(corpus)
 
 
+    def invalidate_models(self, user_ids: Iterable[int]) -> None:
+        """ Drop the cached Markov models of these users, if there are any. """
+        for user_id in user_ids:
+            # Models are cached by User, and Users compare equal by ID.
+            user = self.get_user(user_id)
+            if user is not None:
+                self.get_model.cache_invalidate(user)
+
+
     def validate_message(self, message: Message) -> bool:
         """
         A message must pass all of these checks before Parrot can learn from it.
@@ -245,15 +354,64 @@ class Parrot(commands.AutoShardedBot):
 
         # Add these messages to this user's corpus and return the number of
         # messages that were added.
-        if len(messages) > 0:
-            return self.corpora.add(user, messages)
-        return 0
+        if len(messages) == 0:
+            return 0
+        num_learned = self.corpora.add(user, messages)
+        if num_learned > 0:
+            # Having data makes this user someone "imitate someone" can pick
+            # wherever they talk.
+            for guild_id in {message.guild.id for message in messages}:
+                self.member_index.add(guild_id, user.id)
+        return num_learned
+
+
+    def index_member(self, member: Member) -> None:
+        """
+        Add a member to the people "imitate someone" can pick in their guild,
+        if Parrot can imitate them.
+        """
+        if (
+            member.id != self.user.id and
+            (member.bot or member.id in self.registered_users) and
+            member.id in self.corpora.users_with_data
+        ):
+            self.member_index.add(member.guild.id, member.id)
 
 
     def update_learning_channels(self) -> None:
         """ Fetch and cache the set of channels that Parrot can learn from. """
         res = self.db.execute("SELECT id FROM channels WHERE can_learn_here = 1")
         self.learning_channels = {row[0] for row in res.fetchall()}
+        # Rebuilt when it's next needed, since the channel cache might not be
+        # ready yet.
+        self._learning_channels_by_guild: \
+            dict[int, list[GuildChannel]] | None = None
+
+
+    async def get_learning_channels_by_guild(
+        self
+    ) -> dict[int, list[GuildChannel]]:
+        """
+        Get the channels that Parrot can learn from, grouped by guild ID.
+        """
+        if self._learning_channels_by_guild is not None:
+            return self._learning_channels_by_guild
+
+        learning_channels = self.learning_channels
+        index: defaultdict[int, list[GuildChannel]] = defaultdict(list)
+        for channel_id in learning_channels:
+            channel = self.get_channel(channel_id)
+            if channel is None:
+                try:
+                    channel = await self.fetch_channel(channel_id)
+                except (discord.NotFound, discord.Forbidden):
+                    continue
+            index[channel.guild.id].append(channel)
+
+        # Don't keep the index if the channels changed while building it.
+        if self.learning_channels is learning_channels:
+            self._learning_channels_by_guild = dict(index)
+        return dict(index)
 
 
     def update_speaking_channels(self) -> None:
@@ -272,22 +430,6 @@ class Parrot(commands.AutoShardedBot):
         return self.registered_users
 
 
-    @cache
-    def get_guild_prefix_suffix(self, guild_id: int) -> tuple[str, str]:
-        res = self.db.execute(
-            """
-            SELECT imitation_prefix, imitation_suffix
-            FROM guilds
-            WHERE id = ?
-            """,
-            (guild_id,)
-        )
-        result = res.fetchone()
-        if result is None:
-            return "Not ", ""
-        return result
-
-
     def find_text(self, message: Message) -> str:
         """
         Search for text within a message.
@@ -318,19 +318,10 @@ class Admin(commands.Cog):
     async def prefix(self, ctx: commands.Context, *, new_prefix: str | None=None) -> None:
         """ Change the imitation prefix. """
         if new_prefix is not None:  # Set
-            # Upsert the new prefix.
-            self.bot.db.execute(
-                """
-                INSERT INTO guilds (id, imitation_prefix)
-                VALUES (?, ?)
-                ON CONFLICT (id) DO UPDATE
-                SET imitation_prefix = EXCLUDED.imitation_prefix
-                """,
-                (ctx.guild.id, new_prefix)
-            )
+            self.bot.guild_settings.set_prefix(ctx.guild.id, new_prefix)
             await ctx.send(f"✅ Parrot's imitation prefix is now: `{new_prefix}`")
         else:  # Get
-            prefix, _ = self.bot.get_guild_prefix_suffix(ctx.guild.id)
+            prefix = self.bot.guild_settings.get(ctx.guild.id).imitation_prefix
             await ctx.send(f"Parrot's imitation prefix is: `{prefix}`")
 
     @commands.command()
@@ -340,19 +331,10 @@ class Admin(commands.Cog):
     async def suffix(self, ctx: commands.Context, *, new_suffix: str | None=None) -> None:
         """ Change the imitation suffix. """
         if new_suffix is not None:  # Set
-            # Upsert the new suffix.
-            self.bot.db.execute(
-                """
-                INSERT INTO guilds (id, imitation_suffix)
-                VALUES (?, ?)
-                ON CONFLICT (id) DO UPDATE
-                SET imitation_suffix = EXCLUDED.imitation_suffix
-                """,
-                (ctx.guild.id, new_suffix)
-            )
+            self.bot.guild_settings.set_suffix(ctx.guild.id, new_suffix)
             await ctx.send(f"✅ Parrot's imitation suffix is now: `{new_suffix}`")
         else:  # Get
-            _, suffix = self.bot.get_guild_prefix_suffix(ctx.guild.id)
+            suffix = self.bot.guild_settings.get(ctx.guild.id).imitation_suffix
             await ctx.send(f"Parrot's imitation suffix is: `{suffix}`")
 
 
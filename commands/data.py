@@ -146,6 +146,10 @@ class Data(commands.Cog):
 
             # Delete the user's corpus.
             self.bot.corpora.delete(user)
+            # Make the next Quickstart scan everything again.
+            self.bot.checkpoints.delete(user)
+            # No data means nothing to imitate.
+            self.bot.member_index.remove_user(user.id)
 
             # Invalidate this confirmation code
             del self.pending_confirmations[confirm_code]
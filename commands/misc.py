@@ -12,9 +12,11 @@ class Miscellaneous(commands.Cog):
     @commands.cooldown(2, 4, commands.BucketType.user)
     async def ping(self, ctx: commands.Context) -> None:
         """ Get the bot's reponse time. """
-        await ctx.send(
-            f"NEED PING??? Took **{round(self.bot.latency * 1000, 2)}** ms"
-        )
+        text = f"NEED PING??? Took **{round(self.bot.latency * 1000, 2)}** ms"
+        depth = self.bot.send_scheduler.depth(ctx.channel.id)
+        if depth > 0:
+            text += f"\n{depth} imitations waiting to be sent here"
+        await ctx.send(text)
 
     @commands.command(
         aliases=["about", "bio", "code", "github", "source", "sourcecode"]
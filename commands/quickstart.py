@@ -2,9 +2,9 @@ from discord import Member, Message, User
 from bot import Parrot
 
 import asyncio
-import discord
 from discord.ext import commands
-from utils import HistoryCrawler, ParrotEmbed
+from utils import HistoryCrawler, ParrotEmbed, ScanCoordinator
+from utils.backfill_scheduler import BackfillTicket
 from utils.exceptions import AlreadyScanning, NotRegisteredError, UserPermissionError
 from utils.checks import is_admin
 from utils.converters import Userlike
@@ -16,6 +16,39 @@ class Quickstart(commands.Cog):
         # Keep track of Quickstart scans that are currently happening.
         # Contains user IDs
         self.ongoing_scans: set[int] = set()
+        # Channel scans shared between everyone running Quickstart at once.
+        # Scans pick up where the user's last Quickstart left off.
+        self.scans = ScanCoordinator(
+            scheduler=bot.backfill,
+            checkpoints=bot.checkpoints,
+        )
+
+
+    async def live_update_queue_position(
+        self,
+        status_message: Message,
+        user: User,
+        ticket: BackfillTicket
+    ) -> None:
+        while not ticket.started:
+            position = ticket.position
+            embed = ParrotEmbed(
+                description=(
+                    "**Waiting in line...**\n"
+                    f"{position} Quickstart{'' if position == 1 else 's'} "
+                    "ahead of this one."
+                )
+            )
+            embed.set_author(
+                name="Quickstart",
+                icon_url="https://i.gifer.com/ZZ5H.gif",  # Loading spinner
+            )
+            embed.set_footer(
+                text=f"Scanning for {user}",
+                icon_url=user.display_avatar.url,
+            )
+            await status_message.edit(embed=embed)
+            await asyncio.sleep(2)
 
 
     async def live_update_status(
@@ -108,42 +141,87 @@ class Quickstart(commands.Cog):
                 )
             ), reference=ctx.message)
 
-            # Create an iterator representing up to 100,000 messages since the user
-            # joined the server.
-            histories = []
-            for channel_id in self.bot.learning_channels:
-                channel = await self.bot.fetch_channel(channel_id)
-                member: Member = None
-                try:
-                    member = await channel.guild.fetch_member(user.id)
-                except discord.errors.NotFound:
-                    continue
-                histories.append(
-                    channel.history(
-                        limit=100_000,
-                        after=member.joined_at,
+            # Wait in line behind everyone else's Quickstarts. Quickstarts
+            # people run for themselves go ahead of ones run for bots.
+            ticket = self.bot.backfill.enqueue(
+                priority=0 if ctx.author == user else 1
+            )
+            try:
+                if not ticket.started:
+                    await asyncio.gather(
+                        self.live_update_queue_position(
+                            status_message=status_message,
+                            user=user,
+                            ticket=ticket,
+                        ),
+                        ticket.wait(),
                     )
-                )
 
-            # Create an object that will scan through the server's message history
-            # and learn from the messages this user has posted.
-            crawler = HistoryCrawler(
-                histories=histories,
-                action=self.bot.learn_from,
-                filter=lambda message: message.author == user,
-                limit=100_000,
-            )
+                # Subscribe to scans of up to 100,000 messages since the user
+                # joined the server in each channel. Scans of the same channel
+                # are shared with anyone else running Quickstart at the same
+                # time, and skip whatever this user's earlier Quickstarts
+                # already covered.
+                # Only look in guilds the user is in, checking each guild once.
+                feeds = []
+                channels_by_guild = await self.bot.get_learning_channels_by_guild()
+                for channels in channels_by_guild.values():
+                    member = await self.bot.member_cache.fetch(
+                        channels[0].guild,
+                        user.id,
+                    )
+                    if member is None:
+                        continue
+                    for channel in channels:
+                        feeds.append(
+                            self.scans.subscribe(
+                                channel,
+                                user_id=user.id,
+                                after=member.joined_at,
+                                limit=100_000,
+                            )
+                        )
 
-            # In parallel, start the crawler and periodically update the
-            # status_message with its progress.
-            await asyncio.gather(
-                self.live_update_status(
-                    status_message=status_message,
-                    user=user,
-                    crawler=crawler,
-                ),
-                crawler.crawl(),
-            )
+                # Create an object that will collect the messages this user
+                # has posted as the scans find them. The scheduler already
+                # limits how many history requests go out at once, so read
+                # every feed at once.
+                def learn_from(messages: list[Message]) -> int:
+                    num_learned = self.bot.learn_from(messages)
+                    # Everything the feeds have handed over has been learned
+                    # now, so it's safe to checkpoint up to there.
+                    for feed in feeds:
+                        feed.save()
+                    return num_learned
+
+                crawler = HistoryCrawler(
+                    histories=feeds,
+                    action=learn_from,
+                    filter=lambda message: message.author == user,
+                    limit=100_000,
+                    concurrency=max(1, len(feeds)),
+                )
+
+                # In parallel, start the crawler and periodically update the
+                # status_message with its progress.
+                try:
+                    await asyncio.gather(
+                        self.live_update_status(
+                            status_message=status_message,
+                            user=user,
+                            crawler=crawler,
+                        ),
+                        crawler.crawl(),
+                    )
+                    # Record progress in channels where the user had nothing
+                    # to learn from, too.
+                    for feed in feeds:
+                        feed.save()
+                finally:
+                    for feed in feeds:
+                        feed.close()
+            finally:
+                ticket.done()
 
             # Update the status embed one last time, but DELETE it this time and
             #   post a brand new one so that the user gets a new notification.
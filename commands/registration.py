@@ -31,6 +31,12 @@ class Registration(commands.Cog):
             (ctx.author.id,)
         )
         self.bot.update_registered_users()
+        # Anyone coming back with data from before can be picked by "imitate
+        # someone" again right away.
+        for guild in ctx.author.mutual_guilds:
+            member = guild.get_member(ctx.author.id)
+            if member is not None:
+                self.bot.index_member(member)
 
         embed = ParrotEmbed(
             title="✅ Registered!",
@@ -74,6 +80,7 @@ class Registration(commands.Cog):
             "UPDATE users SET is_registered = 0 WHERE id = ?", (ctx.author.id,)
         )
         self.bot.update_registered_users()
+        self.bot.member_index.remove_user(ctx.author.id)
 
         embed = ParrotEmbed(
             title="Unregistered!",
@@ -1,15 +1,18 @@
 import asyncio
 import logging
+import time
 import traceback
-from typing import Awaitable, Callable
+from typing import Any, Awaitable, Callable
 
-from discord import AllowedMentions, User
+from discord import User
 from bot import Parrot
 
 from discord.ext import commands
-from utils import fetch_webhook, GibberishMarkov, ParrotEmbed, regex, weasel
+from utils import GibberishMarkov, ParrotEmbed, regex, weasel
+from utils.checks import imitate_cooldown
 from utils.converters import FuzzyUserlike
 from utils.exceptions import FriendlyError
+from utils.image_workers import ImageWorkersBusy
 
 
 class Text(commands.Cog):
@@ -49,51 +52,97 @@ class Text(commands.Cog):
             await sent_message.add_reaction("🆗")
             return
 
-        # Fetch this user's model.
         # May throw a NotRegistered or NoData error, which we'll just let the
-        # error handler deal with.
-        model = await self.bot.get_model(user)
+        # error handler deal with. Check now so that nothing else gets started
+        # for someone Parrot can't imitate anyway.
+        self.bot.corpora.assert_registered(user)
+        self.bot.corpora.assert_has_data(user)
+
+        # How long each step took, in seconds.
+        timings: dict[str, float] = {}
+
+        async def timed(step: str, awaitable: Awaitable[Any]) -> Any:
+            start = time.perf_counter()
+            try:
+                return await awaitable
+            finally:
+                timings[step] = time.perf_counter() - start
+
+        # Prepare to send this sentence through a webhook.
+        # Discord lets you change the name and avatar of a webhook account much
+        # faster than those of a bot/user account, which is crucial for
+        # imitating lots of users quickly.
+        async def fetch_avatar_url() -> str:
+            try:
+                return await self.bot.avatars.fetch(user)
+            except ImageWorkersBusy as error:
+                # Happens under heavy load; not worth a whole traceback.
+                logging.warning(
+                    f"Using the unmodified avatar of {user}: {error}"
+                )
+                return user.display_avatar.url
+            except Exception as error:
+                logging.error("\n".join(traceback.format_exception(None, error, error.__traceback__)))
+                return user.display_avatar.url
+
+        # Fetch this user's model, their avatar, and this channel's webhooks
+        # all at once; none of them depend on each other.
+        start = time.perf_counter()
+        model, avatar_url, has_webhook = await asyncio.gather(
+            timed("model", self.bot.get_model(user)),
+            timed("avatar", fetch_avatar_url()),
+            timed("webhook", self.bot.webhooks.prepare(ctx.channel)),
+        )
+        sentence_start = time.perf_counter()
         sentence = model.make_short_sentence(500) or "Error"
+        timings["sentence"] = time.perf_counter() - sentence_start
 
-        prefix, suffix = self.bot.get_guild_prefix_suffix(ctx.guild.id)
+        prefix, suffix = self.bot.guild_settings.get(ctx.guild.id)
         name = f"{prefix}{user.display_name}{suffix}"
 
         if intimidate:
             sentence = "**" + self.discord_caps(sentence) + "**"
             name = name.upper()
 
-        # Prepare to send this sentence through a webhook.
-        # Discord lets you change the name and avatar of a webhook account much
-        # faster than those of a bot/user account, which is crucial for
-        # imitating lots of users quickly.
-        try:
-            avatar_url = await self.bot.avatars.fetch(user)
-        except Exception as error:
-            logging.error("\n".join(traceback.format_exception(None, error, error.__traceback__)))
-            avatar_url = user.display_avatar.url
-
-        webhook = await fetch_webhook(ctx)
-        if webhook is None:
-            # Fall back to using an embed if Parrot doesn't have an webhook and
-            # couldn't make one.
-            await ctx.send(embed=ParrotEmbed(
-                description=sentence,
-            ).set_author(name=name, icon_url=avatar_url))
-        else:
-            # Send the sentence through the webhook.
-            await webhook.send(
+        # Send the sentence through one of this channel's webhooks.
+        # May throw a SendQueueFull or SendExpired error if the channel is too
+        # backed up, which the error handler will tell the user about.
+        message = None
+        if has_webhook:
+            message = await timed("send", self.bot.send_scheduler.send(
+                ctx.channel,
                 content=sentence,
                 username=name,
                 avatar_url=avatar_url,
-                allowed_mentions=AllowedMentions.none(),
-            )
+            ))
+
+        if message is None:
+            # Fall back to using an embed if Parrot doesn't have an webhook and
+            # couldn't make one.
+            message = await timed("send", ctx.send(embed=ParrotEmbed(
+                description=sentence,
+            ).set_author(name=name, icon_url=avatar_url)))
+
+        # Remember who this was so that replying to it can imitate them again.
+        self.bot.imitation_log.record(message.id, user.id)
+
+        logging.debug(
+            f"Imitated {user} in {time.perf_counter() - start:.3f}s (" +
+            ", ".join(
+                f"{step} {seconds:.3f}s" for step, seconds in timings.items()
+            ) +
+            ")"
+        )
 
 
     @commands.command(
         aliases=["be"],
         brief="Imitate someone."
     )
-    @commands.cooldown(2, 2, commands.BucketType.user)
+    @commands.dynamic_cooldown(
+        lambda ctx: imitate_cooldown.get_bucket(ctx.message),
+        commands.BucketType.user,
+    )
     async def imitate(self, ctx: commands.Context, user: FuzzyUserlike) -> None:
         """ Imitate someone. """
         logging.info(f"Imitating {user}")
@@ -159,18 +208,11 @@ class Text(commands.Cog):
         Parrot gibberizes the last message sent in this channel.
         You can also reply to a message and Parrot will gibberize that.
         """
-        async def gibberizer(text: str) -> str:
-            model = await GibberishMarkov.new(text)
-            # Generate gibberish;
-            # try up to 10 times to make it not the same as the source text.
-            old_text = text
-            for _ in range(10):
-                text = model.make_sentence()
-                if text != old_text:
-                    break
-            return text
-
-        await self._modify_text(ctx, input_text=text, modifier=gibberizer)
+        await self._modify_text(
+            ctx,
+            input_text=text,
+            modifier=GibberishMarkov.gibberize,
+        )
 
 
     @commands.command(brief="Devolve a sentence.")
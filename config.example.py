@@ -29,6 +29,37 @@ AUTOSAVE_INTERVAL_SECONDS: int = 3600
 # ID of the channel in which to cache modified avatars
 AVATAR_STORE_CHANNEL_ID: int = 867573882608943127
 
+# Number of channel history requests Quickstart may have in flight at once,
+# across all users
+QUICKSTART_CONCURRENCY: int = 4
+
+# Number of Quickstart jobs that may run at once; the rest wait in line
+QUICKSTART_MAX_JOBS: int = 2
+
+# Directory in which to cache original and modified avatars
+AVATAR_CACHE_DIR: str = os.path.join("database", "avatar-cache")
+
+# Maximum total size of the avatar cache, in bytes
+AVATAR_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+# Number of worker processes for processing avatars
+IMAGE_WORKERS: int = 2
+
+# Number of avatars that may wait for an image worker at once; imitations past
+# this use the user's unmodified avatar instead
+IMAGE_QUEUE_DEPTH: int = 8
+
+# Maximum number of webhooks Parrot makes in each channel to imitate through;
+# more of them lets a busy channel get around each webhook's rate limit
+WEBHOOKS_PER_CHANNEL: int = 3
+
+# Number of imitations that may wait to be sent in each channel at once;
+# imitations past this are turned away
+IMITATE_QUEUE_DEPTH: int = 20
+
+# Seconds an imitation may wait to be sent before it's given up on
+IMITATE_MAX_WAIT_SECONDS: float = 10
+
 # Whether or not to say "lmao" when someone says "ayy"
 AYY_LMAO: bool = True
 
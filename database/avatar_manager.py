@@ -1,62 +1,132 @@
+from typing import NamedTuple
+from datetime import datetime, timedelta, timezone
 import aiohttp
 import asyncio
 import urllib.parse
 import os
 import logging
-from discord import File, TextChannel, User
+from discord import File, HTTPException, Object, TextChannel, User
 from discord.errors import NotFound
+from discord.utils import snowflake_time
 import config
+from utils.disk_cache import DiskCache
 from utils.image import modify_avatar
+from utils.image_workers import ImageWorkerPool
 from utils import tag
 
 
+class StoredAvatar(NamedTuple):
+    original_avatar_id: str  # See AvatarManager._avatar_url_id()
+    modified_avatar_url: str
+    modified_avatar_message_id: int
+
+
 class AvatarManager:
+    # How long to gather up old avatar store messages before deleting them.
+    GC_INTERVAL_SECONDS = 60
+
+    # Discord only bulk deletes messages younger than two weeks. Leave some
+    # leeway for clock skew.
+    BULK_DELETE_MAX_AGE = timedelta(days=13, hours=12)
+
+    # How many cleanups in a row can fail to delete an avatar store message
+    # before Parrot gives up on it.
+    GC_MAX_ATTEMPTS = 5
+
     def __init__(
         self,
         loop,
         db,
         http_session: aiohttp.ClientSession,
-        fetch_channel
+        fetch_channel,
+        image_workers: ImageWorkerPool
     ):
         self.loop = loop
         self.db = db
         self.http_session = http_session
         self.fetch_channel = fetch_channel
+        self.image_workers = image_workers
+        # Original and modified avatars, so that regenerating one never has to
+        # download or process it again.
+        self.image_cache = DiskCache(
+            directory=config.AVATAR_CACHE_DIR,
+            max_bytes=config.AVATAR_CACHE_MAX_BYTES,
+        )
+        self._avatar_channel: TextChannel | None = None
 
+        # Users whose modified avatars are waiting to be regenerated in the
+        # background, most recent User object for each.
+        # Key: user ID
+        self._refresh_pending: dict[int, User] = {}
+        self._refresh_queue: asyncio.Queue[int] = asyncio.Queue()
+        self._refresh_task: asyncio.Task | None = None
 
-    async def fetch(self, user: User) -> str:
+        # Avatar generations underway, so that simultaneous requests for the
+        # same avatar share one.
+        # Key: (user ID, avatar hash)
+        self._in_flight: dict[tuple[int, str], asyncio.Task[str]] = {}
+
+        # Avatar store messages that no longer hold anyone's current avatar,
+        # waiting to be deleted. Kept in the database too so that they still
+        # get deleted if Parrot restarts first.
+        res = self.db.execute("SELECT message_id FROM avatar_store_orphans")
+        self._orphans: set[int] = {row[0] for row in res.fetchall()}
+        # Failed deletion attempts so far.
+        # Key: message ID
+        self._gc_attempts: dict[int, int] = {}
+        self._gc_task: asyncio.Task | None = None
+        if len(self._orphans) > 0:
+            self._gc_task = self.loop.create_task(self._gc_worker())
+
+        # Write-through copy of the avatar columns of the users table, so that
+        # checking for an up-to-date modified avatar doesn't touch the database.
+        # Key: user ID
+        self._stored: dict[int, StoredAvatar] = {}
         res = self.db.execute(
             """
-            SELECT original_avatar_url,
+            SELECT id,
+                   original_avatar_url,
                    modified_avatar_url,
                    modified_avatar_message_id
-            FROM users WHERE id = ?
-            """,
-            (user.id,)
+            FROM users
+            WHERE original_avatar_url IS NOT NULL
+              AND modified_avatar_url IS NOT NULL
+            """
         )
-        data = res.fetchone()
+        for user_id, original_url, modified_url, message_id in res.fetchall():
+            self._stored[user_id] = StoredAvatar(
+                self._avatar_url_id(original_url),
+                modified_url,
+                message_id,
+            )
 
-        avatar_channel = await self.fetch_channel(config.AVATAR_STORE_CHANNEL_ID)
 
-        if data is not None:
-            (
-                original_avatar_url,
-                modified_avatar_url,
-                modified_avatar_message_id
-            ) = data
-
-            # User hasn't changed their avatar since last time they did
-            # |imitate, so we can use the cached modified avatar.
-            if self._avatar_url_id(user.display_avatar.url) == self._avatar_url_id(original_avatar_url):
-                return modified_avatar_url
-
-            # Else, user has changed their avatar.
-            # Respect the user's privacy by deleting the message with their old
-            # avatar.
-            # Don't wait for this operation to complete before continuing.
-            asyncio.create_task(
-                self._delete_message(avatar_channel, modified_avatar_message_id)
-            )
+    async def fetch(self, user: User) -> str:
+        stored = self._stored.get(user.id)
+
+        # User hasn't changed their avatar since last time they did |imitate,
+        # so we can use the cached modified avatar.
+        if (
+            stored is not None and
+            self._avatar_url_id(user.display_avatar.url) == stored.original_avatar_id
+        ):
+            return stored.modified_avatar_url
+
+        # If this avatar is already being generated, wait for that instead of
+        # generating it again.
+        key = (user.id, user.display_avatar.key)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self.loop.create_task(self._generate(user))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield the shared task so one caller giving up doesn't cancel it for
+        # everyone else.
+        return await asyncio.shield(task)
+
+
+    async def _generate(self, user: User) -> str:
+        avatar_channel = await self._get_avatar_channel()
 
         # User has changed their avatar since last time they did |imitate or has
         # not done |imitate before, so we must create a modified version of
@@ -64,7 +134,12 @@ class AvatarManager:
         # We employ the classic Discord As A CDN method to cache the modified
         # avatars by posting them to a Discord channel and storing the message
         # IDs for later.
-        modified_avatar, file_format = await modify_avatar(user)
+        modified_avatar, file_format = await modify_avatar(
+            user,
+            self.http_session,
+            self.image_cache,
+            self.image_workers,
+        )
         message = await avatar_channel.send(
             file=File(modified_avatar, f"{user.id}.{file_format}")
         )
@@ -85,23 +160,157 @@ class AvatarManager:
                 user.id
             )
         )
+        old = self._stored.get(user.id)
+        self._stored[user.id] = StoredAvatar(
+            self._avatar_url_id(user.display_avatar.url),
+            message.attachments[0].url,
+            message.id,
+        )
+
+        # Respect the user's privacy by deleting the message with the avatar
+        # this one replaced.
+        if old is not None:
+            self._retire(old.modified_avatar_message_id)
         return message.attachments[0].url
 
 
-    async def _delete_message(
-        self,
-        channel: TextChannel,
-        message_id: int
-    ) -> None:
-        try:
-            message = await channel.fetch_message(message_id)
-        except NotFound:
-            logging.warn(
-                f"Tried to delete message {message_id} from the avatar store, "
-                "but it doesn't exist."
+    def has_stored(self, user_id: int) -> bool:
+        """ Whether Parrot has made a modified avatar for this user before. """
+        return user_id in self._stored
+
+
+    def schedule_refresh(self, user: User) -> None:
+        """
+        Regenerate a user's modified avatar in the background, so it's ready
+        by the next time they're imitated.
+        """
+        already_queued = user.id in self._refresh_pending
+        self._refresh_pending[user.id] = user
+        if not already_queued:
+            self._refresh_queue.put_nowait(user.id)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = self.loop.create_task(self._refresh_worker())
+
+
+    async def _refresh_worker(self) -> None:
+        # Regenerate one avatar at a time so a wave of avatar changes doesn't
+        # crowd out imitations.
+        while True:
+            user_id = await self._refresh_queue.get()
+            user = self._refresh_pending.pop(user_id, None)
+            if user is None:
+                continue
+            try:
+                await self.fetch(user)
+            except Exception as error:
+                logging.error(
+                    f"Failed to regenerate the avatar of {tag(user)}: {error}"
+                )
+
+
+    async def _get_avatar_channel(self) -> TextChannel:
+        """ Get the avatar store channel, only fetching it the first time. """
+        if self._avatar_channel is None:
+            self._avatar_channel = await self.fetch_channel(
+                config.AVATAR_STORE_CHANNEL_ID
             )
-        else:
-            await message.delete()
+        return self._avatar_channel
+
+
+    def _retire(self, message_id: int) -> None:
+        """ Mark an avatar store message for deletion in the next batch. """
+        self._orphans.add(message_id)
+        self.db.execute(
+            "INSERT OR IGNORE INTO avatar_store_orphans (message_id) VALUES (?)",
+            (message_id,)
+        )
+        if self._gc_task is None or self._gc_task.done():
+            self._gc_task = self.loop.create_task(self._gc_worker())
+
+
+    async def _gc_worker(self) -> None:
+        while len(self._orphans) > 0:
+            await asyncio.sleep(self.GC_INTERVAL_SECONDS)
+            message_ids = list(self._orphans)
+            try:
+                gone = await self._delete_messages(message_ids)
+            except Exception as error:
+                logging.error(
+                    f"Failed to clean up the avatar store: {error}"
+                )
+                gone = set()
+
+            # Keep whatever didn't get deleted for the next run, but don't
+            # retry it forever.
+            finished = []
+            for message_id in message_ids:
+                if message_id not in gone:
+                    attempts = self._gc_attempts.get(message_id, 0) + 1
+                    if attempts < self.GC_MAX_ATTEMPTS:
+                        self._gc_attempts[message_id] = attempts
+                        continue
+                    logging.warning(
+                        f"Giving up on deleting message {message_id} from the "
+                        f"avatar store after {attempts} attempts."
+                    )
+                self._gc_attempts.pop(message_id, None)
+                finished.append(message_id)
+            if len(finished) == 0:
+                continue
+            self._orphans.difference_update(finished)
+            placeholders = ", ".join("?" * len(finished))
+            self.db.execute(
+                "DELETE FROM avatar_store_orphans "
+                f"WHERE message_id IN ({placeholders})",
+                finished
+            )
+
+
+    async def _delete_messages(self, message_ids: list[int]) -> set[int]:
+        """
+        Delete messages from the avatar store by ID, without fetching them
+        first. Deletes messages young enough for it in bulk, up to 100 at once.
+        Returns the IDs of the messages that are gone now, whether this deleted
+        them or they already were.
+        """
+        channel = await self._get_avatar_channel()
+        cutoff = datetime.now(timezone.utc) - self.BULK_DELETE_MAX_AGE
+        recent = [i for i in message_ids if snowflake_time(i) > cutoff]
+        old = [i for i in message_ids if snowflake_time(i) <= cutoff]
+
+        gone: set[int] = set()
+        for i in range(0, len(recent), 100):
+            chunk = recent[i:i + 100]
+            try:
+                await channel.delete_messages(
+                    [Object(id=message_id) for message_id in chunk]
+                )
+            except NotFound:
+                pass
+            except HTTPException as error:
+                logging.warning(
+                    f"Failed to delete {len(chunk)} messages from the avatar "
+                    f"store: {error}"
+                )
+                continue
+            gone.update(chunk)
+        for message_id in old:
+            try:
+                await channel.get_partial_message(message_id).delete()
+            except NotFound:
+                pass
+            except HTTPException as error:
+                logging.warning(
+                    f"Failed to delete message {message_id} from the avatar "
+                    f"store: {error}"
+                )
+                continue
+            gone.add(message_id)
+
+        logging.info(
+            f"Deleted {len(gone)} old avatars from the avatar store."
+        )
+        return gone
 
 
     def _avatar_url_id(self, url: str) -> str:
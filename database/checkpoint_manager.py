@@ -0,0 +1,64 @@
+from typing import NamedTuple
+from discord import User, Member
+
+
+class Checkpoint(NamedTuple):
+    # The range of message IDs that Quickstart has already scanned for a user
+    # in a channel, inclusive.
+    oldest_id: int
+    newest_id: int
+    # Whether the scan made it all the way back to when the user joined the
+    # server, so that only messages newer than newest_id are left to scan.
+    complete: bool
+
+
+class CheckpointManager:
+    def __init__(self, db):
+        self.db = db
+
+
+    def get(self, user_id: int, channel_id: int) -> Checkpoint | None:
+        """ Get how far Quickstart has scanned for a user in a channel. """
+        res = self.db.execute(
+            """
+            SELECT oldest_id, newest_id, complete
+            FROM quickstart_checkpoints
+            WHERE user_id = ? AND channel_id = ?
+            """,
+            (user_id, channel_id)
+        )
+        row = res.fetchone()
+        if row is None:
+            return None
+        return Checkpoint(row[0], row[1], bool(row[2]))
+
+
+    def save(
+        self,
+        user_id: int,
+        channel_id: int,
+        checkpoint: Checkpoint
+    ) -> None:
+        """ Record how far Quickstart has scanned for a user in a channel. """
+        self.db.execute(
+            """
+            INSERT INTO quickstart_checkpoints
+                (user_id, channel_id, oldest_id, newest_id, complete)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, channel_id) DO UPDATE
+            SET oldest_id = EXCLUDED.oldest_id,
+                newest_id = EXCLUDED.newest_id,
+                complete  = EXCLUDED.complete
+            """,
+            (user_id, channel_id, *checkpoint)
+        )
+
+
+    def delete(self, user: User | Member) -> None:
+        """
+        Forget a user's Quickstart progress so that the next Quickstart scans
+        everything again.
+        """
+        self.db.execute(
+            "DELETE FROM quickstart_checkpoints WHERE user_id = ?", (user.id,)
+        )
@@ -1,3 +1,4 @@
+from typing import Iterable
 from discord import User, Member, Message
 from utils.exceptions import NoDataError, NotRegisteredError
 from utils import tag
@@ -8,6 +9,9 @@ class CorpusManager:
         self.db = db
         self.get_registered_users = get_registered_users
         self.command_prefix = command_prefix
+        # IDs of the users who have at least one message recorded.
+        res = self.db.execute("SELECT DISTINCT user_id FROM messages")
+        self.users_with_data: set[int] = {row[0] for row in res.fetchall()}
 
 
     def add(
@@ -53,7 +57,10 @@ class CorpusManager:
         # Return the number of new messages this added to the database.
         # Not necessarily the number of messages passed in.
         res = self.db.execute("SELECT CHANGES()")
-        return res.fetchone()[0]
+        num_added = res.fetchone()[0]
+        if num_added > 0:
+            self.users_with_data.add(user.id)
+        return num_added
 
 
     def edit(self, message_id: int, new_content: str) -> None:
@@ -90,22 +97,59 @@ class CorpusManager:
         )
         res = self.db.execute("SELECT CHANGES()")
         num_deleted = res.fetchone()[0]
+        self.users_with_data.discard(user.id)
         if num_deleted == 0:
             raise NoDataError(f"No data available for user {tag(user)}.")
 
 
-    def delete_message(self, message_id: int) -> None:
-        """ Delete a message from the database. """
-        self.db.execute(
-            "DELETE FROM messages WHERE id = ?", (message_id,)
+    def delete_message(self, message_id: int) -> int:
+        """
+        Delete a message from the database.
+        @returns: the ID of the user who owned it.
+        """
+        res = self.db.execute(
+            "DELETE FROM messages WHERE id = ? RETURNING user_id", (message_id,)
         )
-        res = self.db.execute("SELECT CHANGES()")
-        num_deleted = res.fetchone()[0]
-        if num_deleted == 0:
+        rows = res.fetchall()
+        if len(rows) == 0:
             raise NoDataError(
                 f"Message with ID {message_id} was not recorded in the first "
                 "place."
             )
+        user_id = rows[0][0]
+        self._recheck_data((user_id,))
+        return user_id
+
+
+    def delete_messages(self, message_ids: Iterable[int]) -> set[int]:
+        """
+        Delete many messages from the database in one statement.
+        @returns: the IDs of the users who owned the deleted messages.
+        """
+        message_ids = list(message_ids)
+        if len(message_ids) == 0:
+            return set()
+        placeholders = ", ".join("?" * len(message_ids))
+        res = self.db.execute(
+            f"DELETE FROM messages WHERE id IN ({placeholders}) RETURNING user_id",
+            message_ids
+        )
+        user_ids = {row[0] for row in res.fetchall()}
+        self._recheck_data(user_ids)
+        return user_ids
+
+
+    def _recheck_data(self, user_ids: Iterable[int]) -> None:
+        """
+        Take users out of users_with_data if their last messages were just
+        deleted.
+        """
+        for user_id in user_ids:
+            res = self.db.execute(
+                "SELECT 1 FROM messages WHERE user_id = ? LIMIT 1", (user_id,)
+            )
+            if res.fetchone() is None:
+                self.users_with_data.discard(user_id)
 
 
     def has(self, user: User | Member) -> bool:
@@ -116,6 +160,12 @@ class CorpusManager:
         return res.fetchone()[0] > 0
 
 
+    def assert_has_data(self, user: User | Member) -> None:
+        """ Like has(), but without the trip to the database. """
+        if user.id not in self.users_with_data:
+            raise NoDataError(f"No data available for user {tag(user)}.")
+
+
     def assert_registered(self, user: User | Member) -> None:
         if not user.bot and user.id not in self.get_registered_users():
             raise NotRegisteredError(
@@ -0,0 +1,69 @@
+from typing import NamedTuple
+
+
+class GuildSettings(NamedTuple):
+    imitation_prefix: str = "Not "
+    imitation_suffix: str = ""
+
+
+class GuildSettingsManager:
+    """
+    Write-through copy of the guilds table, so that reading a guild's settings
+    is just a dict lookup.
+    Guilds that never changed their settings don't have a row and aren't kept
+    in memory, so it only grows as big as the number of guilds that did.
+    """
+    DEFAULT = GuildSettings()
+
+    def __init__(self, db):
+        self.db = db
+        # Key: guild ID
+        self._settings: dict[int, GuildSettings] = {}
+        res = self.db.execute(
+            "SELECT id, imitation_prefix, imitation_suffix FROM guilds"
+        )
+        for guild_id, prefix, suffix in res.fetchall():
+            self._update(guild_id, GuildSettings(prefix, suffix))
+
+
+    def get(self, guild_id: int) -> GuildSettings:
+        return self._settings.get(guild_id, self.DEFAULT)
+
+
+    def set_prefix(self, guild_id: int, prefix: str) -> None:
+        self.db.execute(
+            """
+            INSERT INTO guilds (id, imitation_prefix)
+            VALUES (?, ?)
+            ON CONFLICT (id) DO UPDATE
+            SET imitation_prefix = EXCLUDED.imitation_prefix
+            """,
+            (guild_id, prefix)
+        )
+        self._update(
+            guild_id,
+            self.get(guild_id)._replace(imitation_prefix=prefix),
+        )
+
+
+    def set_suffix(self, guild_id: int, suffix: str) -> None:
+        self.db.execute(
+            """
+            INSERT INTO guilds (id, imitation_suffix)
+            VALUES (?, ?)
+            ON CONFLICT (id) DO UPDATE
+            SET imitation_suffix = EXCLUDED.imitation_suffix
+            """,
+            (guild_id, suffix)
+        )
+        self._update(
+            guild_id,
+            self.get(guild_id)._replace(imitation_suffix=suffix),
+        )
+
+
+    def _update(self, guild_id: int, settings: GuildSettings) -> None:
+        if settings == self.DEFAULT:
+            self._settings.pop(guild_id, None)
+        else:
+            self._settings[guild_id] = settings
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from discord.utils import time_snowflake
+
+
+class ImitationLogManager:
+    """
+    Remembers who each of Parrot's imitation messages imitated, so that
+    replying to one can imitate the same person again.
+    """
+    # How many of the latest imitations to keep in memory; most replies are to
+    # recent messages.
+    HOT_SIZE = 4096
+
+    # How long to remember imitations for at all.
+    MAX_AGE = timedelta(days=30)
+
+    def __init__(self, db):
+        self.db = db
+        # Key: message ID; value: imitated user's ID
+        self._hot: OrderedDict[int, int] = OrderedDict()
+        res = self.db.execute(
+            """
+            SELECT message_id, user_id FROM imitations
+            ORDER BY message_id DESC
+            LIMIT ?
+            """,
+            (self.HOT_SIZE,)
+        )
+        for message_id, user_id in reversed(res.fetchall()):
+            self._hot[message_id] = user_id
+
+
+    def record(self, message_id: int, user_id: int) -> None:
+        self.db.execute(
+            """
+            INSERT OR IGNORE INTO imitations (message_id, user_id)
+            VALUES (?, ?)
+            """,
+            (message_id, user_id)
+        )
+        self._hot[message_id] = user_id
+        while len(self._hot) > self.HOT_SIZE:
+            self._hot.popitem(last=False)
+
+
+    def get(self, message_id: int) -> int | None:
+        """ Get the ID of the user an imitation message imitated. """
+        user_id = self._hot.get(message_id)
+        if user_id is not None:
+            return user_id
+        res = self.db.execute(
+            "SELECT user_id FROM imitations WHERE message_id = ?",
+            (message_id,)
+        )
+        row = res.fetchone()
+        return row[0] if row is not None else None
+
+
+    def prune(self) -> None:
+        """ Forget imitations older than MAX_AGE. """
+        cutoff = time_snowflake(datetime.now(timezone.utc) - self.MAX_AGE)
+        self.db.execute(
+            "DELETE FROM imitations WHERE message_id < ?", (cutoff,)
+        )
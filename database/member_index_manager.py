@@ -0,0 +1,109 @@
+import random
+
+
+class MemberIndexManager:
+    """
+    The IDs of the members of each guild whom Parrot can imitate, for picking
+    one at random without going through the guild's whole member list.
+    Write-through copy of the guild_members table, so that it survives
+    restarts without needing Parrot's member cache to rebuild it.
+    """
+    def __init__(self, db):
+        self.db = db
+        # Each guild's members in a list, for picking at random, and where each
+        # one is in that list, for taking them out without searching for them.
+        # Key: guild ID
+        self._members: dict[int, list[int]] = {}
+        self._positions: dict[int, dict[int, int]] = {}
+        # Key: user ID
+        self._guilds_of: dict[int, set[int]] = {}
+
+        res = self.db.execute("SELECT guild_id, user_id FROM guild_members")
+        for guild_id, user_id in res.fetchall():
+            self._add(guild_id, user_id)
+
+
+    def add(self, guild_id: int, user_id: int) -> None:
+        if not self._add(guild_id, user_id):
+            return
+        self.db.execute(
+            "INSERT OR IGNORE INTO guild_members (guild_id, user_id) "
+            "VALUES (?, ?)",
+            (guild_id, user_id)
+        )
+
+
+    def remove(self, guild_id: int, user_id: int) -> None:
+        if not self._remove(guild_id, user_id):
+            return
+        self.db.execute(
+            "DELETE FROM guild_members WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id)
+        )
+
+
+    def remove_user(self, user_id: int) -> None:
+        """ Take a user out of every guild they're in. """
+        guild_ids = self._guilds_of.get(user_id)
+        if guild_ids is None:
+            return
+        for guild_id in list(guild_ids):
+            self._remove(guild_id, user_id)
+        self.db.execute(
+            "DELETE FROM guild_members WHERE user_id = ?", (user_id,)
+        )
+
+
+    def remove_guild(self, guild_id: int) -> None:
+        user_ids = self._members.get(guild_id)
+        if user_ids is None:
+            return
+        for user_id in list(user_ids):
+            self._remove(guild_id, user_id)
+        self.db.execute(
+            "DELETE FROM guild_members WHERE guild_id = ?", (guild_id,)
+        )
+
+
+    def choice(self, guild_id: int) -> int | None:
+        """ Pick a member of a guild at random, or None if there are none. """
+        members = self._members.get(guild_id)
+        if members is None:
+            return None
+        return random.choice(members)
+
+
+    def _add(self, guild_id: int, user_id: int) -> bool:
+        """ Returns False if they were already there. """
+        positions = self._positions.setdefault(guild_id, {})
+        if user_id in positions:
+            return False
+        members = self._members.setdefault(guild_id, [])
+        positions[user_id] = len(members)
+        members.append(user_id)
+        self._guilds_of.setdefault(user_id, set()).add(guild_id)
+        return True
+
+
+    def _remove(self, guild_id: int, user_id: int) -> bool:
+        """ Returns False if they weren't there to begin with. """
+        positions = self._positions.get(guild_id)
+        if positions is None or user_id not in positions:
+            return False
+        # Fill the gap with the last member in the list so that removal
+        # doesn't have to shift everyone after it.
+        members = self._members[guild_id]
+        position = positions.pop(user_id)
+        last = members.pop()
+        if last != user_id:
+            members[position] = last
+            positions[last] = position
+        if len(members) == 0:
+            del self._members[guild_id]
+            del self._positions[guild_id]
+
+        guilds = self._guilds_of[user_id]
+        guilds.discard(guild_id)
+        if len(guilds) == 0:
+            del self._guilds_of[user_id]
+        return True
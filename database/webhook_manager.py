@@ -0,0 +1,205 @@
+from types import SimpleNamespace
+from discord import Client, HTTPException, NotFound, Webhook
+from discord.abc import GuildChannel
+from utils import retry_delay
+import aiohttp
+import asyncio
+import re
+
+
+# Path of the endpoint that sends messages through a webhook.
+WEBHOOK_PATH = re.compile(r"/webhooks/(\d+)/[^/]+$")
+
+# Discord's error code for a channel that has as many webhooks as it can.
+MAX_WEBHOOKS_ERROR = 30007
+
+
+class WebhookManager:
+    """
+    Keeps a pool of Parrot-owned webhooks in each channel Parrot imitates in.
+    Discord rate limits each webhook separately, so spreading imitations over a
+    few of them lets a busy channel go faster than one webhook would allow.
+    """
+    def __init__(self, db, client: Client, max_per_channel: int = 3):
+        self.db = db
+        self.client = client
+        self.max_per_channel = max(1, max_per_channel)
+        # Pools that have been loaded from the database.
+        # Key: channel ID
+        self._pools: dict[int, list[Webhook]] = {}
+        # Channels where Discord won't let Parrot make any more webhooks.
+        self._full: set[int] = set()
+        self._locks: dict[int, asyncio.Lock] = {}
+
+        # Rate limit state of each webhook, read off of the responses to
+        # sending through it. Event loop times.
+        # Key: webhook ID
+        self._reset_at: dict[int, float] = {}
+        self._last_limited: dict[int, float] = {}
+        self._last_used: dict[int, float] = {}
+
+
+    async def acquire(self, channel: GuildChannel) -> Webhook | None:
+        """
+        Pick a webhook to send through in this channel: the one that ran into
+        its rate limit longest ago, out of those that aren't limited right now.
+        The pool only grows once every webhook in it is limited.
+        Returns None if Parrot has no webhook here and can't make one.
+        """
+        async with self._lock(channel.id):
+            pool = await self._load(channel)
+            now = asyncio.get_running_loop().time()
+            ready = [
+                webhook for webhook in pool
+                if self._reset_at.get(webhook.id, 0.0) <= now
+            ]
+            if (
+                len(ready) == 0 and
+                len(pool) < self.max_per_channel and
+                channel.id not in self._full
+            ):
+                webhook = await self._create(channel)
+                if webhook is not None:
+                    ready = [webhook]
+                    pool = self._pools[channel.id]
+            if len(pool) == 0:
+                return None
+
+            if len(ready) > 0:
+                webhook = min(ready, key=lambda webhook: (
+                    self._last_limited.get(webhook.id, 0.0),
+                    self._last_used.get(webhook.id, 0.0),
+                ))
+            else:
+                # Everything's limited; go with whichever frees up first.
+                webhook = min(
+                    pool,
+                    key=lambda webhook: self._reset_at[webhook.id],
+                )
+            self._last_used[webhook.id] = now
+            return webhook
+
+
+    async def prepare(self, channel: GuildChannel) -> bool:
+        """
+        Get this channel's webhooks ready ahead of time, making the first one
+        if there are none yet, so that acquiring one later won't have to wait
+        on Discord.
+        Returns False if Parrot has no webhook here and can't make one.
+        """
+        async with self._lock(channel.id):
+            pool = await self._load(channel)
+            if len(pool) == 0 and channel.id not in self._full:
+                await self._create(channel)
+            return len(pool) > 0
+
+
+    def retry_after(self, webhook: Webhook) -> float:
+        """ Seconds until this webhook's rate limit lets it send again. """
+        reset_at = self._reset_at.get(webhook.id, 0.0)
+        return max(0.0, reset_at - asyncio.get_running_loop().time())
+
+
+    def forget(self, channel_id: int, webhook: Webhook) -> None:
+        """ Stop using a webhook, like when it's been deleted. """
+        self.db.execute("DELETE FROM webhooks WHERE id = ?", (webhook.id,))
+        pool = self._pools.get(channel_id)
+        if pool is not None and webhook in pool:
+            pool.remove(webhook)
+        self._full.discard(channel_id)
+        self._reset_at.pop(webhook.id, None)
+        self._last_limited.pop(webhook.id, None)
+        self._last_used.pop(webhook.id, None)
+
+
+    async def on_request_end(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        if params.method != "POST":
+            return
+        match = WEBHOOK_PATH.search(params.url.path)
+        if match is None:
+            return
+
+        limit = retry_delay(params.response)
+        if limit is None:
+            return
+        delay, _ = limit
+
+        webhook_id = int(match.group(1))
+        now = asyncio.get_running_loop().time()
+        self._reset_at[webhook_id] = now + delay
+        self._last_limited[webhook_id] = now
+
+
+    def _lock(self, channel_id: int) -> asyncio.Lock:
+        return self._locks.setdefault(channel_id, asyncio.Lock())
+
+
+    async def _load(self, channel: GuildChannel) -> list[Webhook]:
+        pool = self._pools.get(channel.id)
+        if pool is not None:
+            return pool
+
+        pool = []
+        res = self.db.execute(
+            "SELECT id, token FROM webhooks WHERE channel_id = ?",
+            (channel.id,)
+        )
+        for webhook_id, token in res.fetchall():
+            if token is not None:
+                # No need to ask Discord for a webhook we know the token of.
+                # If it's gone, sending through it will say so.
+                pool.append(
+                    Webhook.partial(webhook_id, token, client=self.client)
+                )
+                continue
+            # Saved before Parrot kept webhook tokens; look it up once.
+            try:
+                webhook = await self.client.fetch_webhook(webhook_id)
+            except NotFound:
+                self.db.execute(
+                    "DELETE FROM webhooks WHERE id = ?", (webhook_id,)
+                )
+                continue
+            self.db.execute(
+                "UPDATE webhooks SET token = ? WHERE id = ?",
+                (webhook.token, webhook_id)
+            )
+            pool.append(webhook)
+        self._pools[channel.id] = pool
+        return pool
+
+
+    async def _create(self, channel: GuildChannel) -> Webhook | None:
+        try:
+            webhook = await channel.create_webhook(
+                name=f"Parrot in #{channel.name}",
+                avatar=(await self.client.user.display_avatar.read()),
+                reason="Automatically created by Parrot",
+            )
+        except HTTPException as error:
+            # - Forbidden: Parrot lacks permission to make webhooks here.
+            # - HTTPException: 400 Bad Request; there is already the maximum
+            #   number of webhooks allowed in this channel (error code 30007).
+            #   Anything else might work next time.
+            if error.code == MAX_WEBHOOKS_ERROR:
+                self._full.add(channel.id)
+            return None
+        except AttributeError:
+            # Cannot make a webhook in this type of channel, like a DMChannel.
+            return None
+
+        self.db.execute(
+            "INSERT OR IGNORE INTO channels (id) VALUES (?)",
+            (channel.id,)
+        )
+        self.db.execute(
+            "INSERT INTO webhooks (id, channel_id, token) VALUES (?, ?, ?)",
+            (webhook.id, channel.id, webhook.token)
+        )
+        self._pools[channel.id].append(webhook)
+        return webhook
@@ -0,0 +1,31 @@
+from discord import Guild, Member, RawMemberRemoveEvent
+from bot import Parrot
+
+from discord.ext import commands
+
+
+class MemberEventHandler(commands.Cog):
+    """ Keeps track of who "imitate someone" can pick in each server. """
+    def __init__(self, bot: Parrot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: Guild) -> None:
+        self.bot.member_index.remove_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: Member) -> None:
+        # Replaces any cached "not a member" from before they joined.
+        self.bot.member_cache.put(member)
+        self.bot.index_member(member)
+
+    # Must use the raw event because the main event only fires for members in
+    # Parrot's member cache.
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, event: RawMemberRemoveEvent) -> None:
+        self.bot.member_index.remove(event.guild_id, event.user.id)
+        self.bot.member_cache.forget(event.guild_id, event.user.id)
+
+
+async def setup(bot: Parrot) -> None:
+    await bot.add_cog(MemberEventHandler(bot))
@@ -1,12 +1,13 @@
 import random
-from discord import Message
+from discord import Member, Message
 from bot import Parrot
-from utils.exceptions import NotRegisteredError
+from utils.exceptions import FriendlyError, NotRegisteredError
 
 import config
 import logging
 from discord.ext import commands
 from utils import tag, weasel
+from utils.checks import imitate_cooldown
 
 
 class MessageEventHandler(commands.Cog):
@@ -20,6 +21,11 @@ class MessageEventHandler(commands.Cog):
         Handle receiving messages.
         Monitors messages of registered users.
         """
+        self.bot.recent_speakers.record(message)
+        # Whoever's talking is likely to be imitated soon.
+        if isinstance(message.author, Member):
+            self.bot.member_cache.put(message.author)
+
         if message.author.id == self.bot.user.id:
             return
 
@@ -48,35 +54,47 @@ class MessageEventHandler(commands.Cog):
         #     )
 
         # Imitate again when someone replies to an imitate message.
-        # if message.reference is not None:
-        #     src_message = await message.channel.fetch_message(
-        #         message.reference.message_id
-        #     )
-        #     if (src_message is not None and
-        #         src_message.webhook_id is not None and
-        #         src_message.channel.id in self.bot.speaking_channels):
-        #         try:
-        #             # HACK: Get the ID of the user Parrot imitated in this
-        #             # message through the message's AVATAR URL.
-        #             # Really relying on implementation quirks here, but I don't
-        #             # want to put in the effort to, like, log which messages
-        #             # imitate who or something like that to be able to do this
-        #             # properly.
-        #             # If Discord ever changes the structure of their avatar URLs
-        #             # or if I change Parrot to use different avatars, this will
-        #             # probably break. But I guess now we'll just cross that
-        #             # bridge when it comes.
-        #             avatar_url = str(src_message.author.avatar.url)
-        #             user_id = avatar_url.split("/")[4]
-        #             message.content = user_id
-        #             ctx = await self.bot.get_context(message)
-        #             imitate_command = self.bot.get_command("imitate")
-        #             await imitate_command.prepare(ctx)
-        #             await imitate_command(ctx, user_id)
-        #         except Exception as e:
-        #             # Don't try to make amends if this feature fails. It isn't
-        #             # that important.
-        #             pass
+        await self.reimitate(message)
+
+
+    async def reimitate(self, message: Message) -> None:
+        if (
+            message.reference is None or
+            message.reference.message_id is None or
+            message.guild is None or
+            message.author.bot or
+            message.content.startswith(self.bot.command_prefix) or
+            message.channel.id not in self.bot.speaking_channels
+        ):
+            return
+
+        # Discord usually sends the message being replied to along with the
+        # reply. If it's from a regular user, it's not an imitation and there's
+        # no need to look it up.
+        src_message = message.reference.resolved
+        if (
+            isinstance(src_message, Message) and
+            src_message.webhook_id is None and
+            src_message.author.id != self.bot.user.id
+        ):
+            return
+
+        user_id = self.bot.imitation_log.get(message.reference.message_id)
+        if user_id is None:
+            return
+        if imitate_cooldown.get_bucket(message).update_rate_limit():
+            return
+        user = await self.bot.member_cache.fetch(message.guild, user_id)
+        if user is None:
+            return
+
+        ctx = await self.bot.get_context(message)
+        try:
+            await self.bot.get_cog("Text").really_imitate(ctx, user)
+        except FriendlyError:
+            # Don't try to make amends if this feature fails. It isn't that
+            # important.
+            pass
 
 
 async def setup(bot: Parrot) -> None:
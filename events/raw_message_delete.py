@@ -1,4 +1,5 @@
-from discord import RawMessageDeleteEvent
+from typing import Iterable
+from discord import RawBulkMessageDeleteEvent, RawMessageDeleteEvent
 from bot import Parrot
 
 import logging
@@ -14,12 +15,39 @@ class RawMessageDeleteEventHandler(commands.Cog):
     # for messages that happen to be in its cache.
     @commands.Cog.listener()
     async def on_raw_message_delete(self, event: RawMessageDeleteEvent) -> None:
-        self.bot.corpora.delete_message(event.message_id)
+        self.bot.recent_speakers.forget(event.channel_id, (event.message_id,))
+        user_id = self.bot.corpora.delete_message(event.message_id)
+        self._unindex_if_empty((user_id,))
         logging.info(
             f"Forgot message with ID {event.message_id} because it was deleted "
             "from Discord."
         )
 
+    # Moderators' purges delete up to 100 messages at once; forget all of them
+    # in one go instead of one by one.
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(
+        self,
+        event: RawBulkMessageDeleteEvent
+    ) -> None:
+        self.bot.recent_speakers.forget(event.channel_id, event.message_ids)
+        affected_users = self.bot.corpora.delete_messages(event.message_ids)
+        if len(affected_users) == 0:
+            return
+        self.bot.invalidate_models(affected_users)
+        self._unindex_if_empty(affected_users)
+        logging.info(
+            f"Forgot messages from {len(affected_users)} user(s) because "
+            f"{len(event.message_ids)} messages were bulk deleted from Discord "
+            f"in channel {event.channel_id}."
+        )
+
+    def _unindex_if_empty(self, user_ids: Iterable[int]) -> None:
+        """ Stop "imitate someone" from picking users with no data left. """
+        for user_id in user_ids:
+            if user_id not in self.bot.corpora.users_with_data:
+                self.bot.member_index.remove_user(user_id)
+
 
 async def setup(bot: Parrot) -> None:
     await bot.add_cog(RawMessageDeleteEventHandler(bot))
@@ -0,0 +1,41 @@
+from discord import Member, User
+from bot import Parrot
+
+from discord.ext import commands
+
+
+class UserUpdateEventHandler(commands.Cog):
+    def __init__(self, bot: Parrot):
+        self.bot = bot
+
+    # Regenerate registered users' modified avatars as soon as they change
+    # their avatars instead of making the next |imitate wait for it. Users who
+    # have never been imitated don't have one to regenerate.
+    @commands.Cog.listener()
+    async def on_user_update(self, before: User, after: User) -> None:
+        self.refresh_if_changed(before, after)
+
+    # Server-specific avatars.
+    @commands.Cog.listener()
+    async def on_member_update(self, before: Member, after: Member) -> None:
+        self.refresh_if_changed(before, after)
+        # Keep the cached copy's name and roles current.
+        self.bot.member_cache.put(after)
+
+    def refresh_if_changed(
+        self,
+        before: User | Member,
+        after: User | Member
+    ) -> None:
+        if (
+            after.id not in self.bot.registered_users or
+            not self.bot.avatars.has_stored(after.id)
+        ):
+            return
+        if before.display_avatar.key == after.display_avatar.key:
+            return
+        self.bot.avatars.schedule_refresh(after)
+
+
+async def setup(bot: Parrot) -> None:
+    await bot.add_cog(UserUpdateEventHandler(bot))
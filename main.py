@@ -2,11 +2,13 @@ import logging
 import config
 from bot import Parrot
 
-logging.info("Initializing bot...")
-bot = Parrot(
-    prefix=config.COMMAND_PREFIX,
-    db_path=config.DB_PATH,
-    admin_user_ids=config.ADMIN_USER_IDS,
-)
+# Image worker processes import this module too; don't start a bot in them.
+if __name__ == "__main__":
+    logging.info("Initializing bot...")
+    bot = Parrot(
+        prefix=config.COMMAND_PREFIX,
+        db_path=config.DB_PATH,
+        admin_user_ids=config.ADMIN_USER_IDS,
+    )
 
-bot.run(config.DISCORD_BOT_TOKEN)
+    bot.run(config.DISCORD_BOT_TOKEN)
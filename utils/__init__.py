@@ -1,16 +1,20 @@
 from utils.tag import tag
 from utils.executor_function import executor_function
-from utils.fetch_webhook import fetch_webhook
+from utils.retry_delay import retry_delay
+from utils.backfill_scheduler import BackfillScheduler
 from utils.history_crawler import HistoryCrawler
 from utils.parrot_embed import ParrotEmbed
 from utils.parrot_markov import GibberishMarkov, ParrotMarkov
+from utils.scan_coordinator import ScanCoordinator
 
 
 __all__ = [
+    "BackfillScheduler",
     "executor_function",
-    "fetch_webhook",
     "HistoryCrawler",
     "GibberishMarkov", "ParrotMarkov",
     "ParrotEmbed",
+    "retry_delay",
+    "ScanCoordinator",
     "tag"
 ]
@@ -0,0 +1,151 @@
+from typing import AsyncIterator
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from utils.retry_delay import retry_delay
+
+import aiohttp
+import asyncio
+import heapq
+import itertools
+import re
+
+
+# Path of the endpoint channel histories come from.
+HISTORY_PATH = re.compile(r"/channels/(\d+)/messages$")
+
+
+class BackfillTicket:
+    """ A Quickstart job's place in line. """
+    def __init__(self, scheduler: "BackfillScheduler", priority: int, seq: int):
+        self.priority = priority
+        self._seq = seq
+        self._scheduler = scheduler
+        self._started = asyncio.Event()
+
+    def __lt__(self, other: "BackfillTicket") -> bool:
+        return (self.priority, self._seq) < (other.priority, other._seq)
+
+    @property
+    def started(self) -> bool:
+        return self._started.is_set()
+
+    @property
+    def position(self) -> int:
+        """ How many jobs are ahead of this one in line; 0 once it's running. """
+        return self._scheduler.position(self)
+
+    async def wait(self) -> None:
+        """ Wait for this job's turn to run. """
+        await self._started.wait()
+
+    def done(self) -> None:
+        """ Give up this job's place, whether it got to run or not. """
+        self._scheduler.release(self)
+
+
+class BackfillScheduler:
+    """
+    Lines up Quickstart jobs so only a few run at once, and paces the channel
+    history requests they make according to the rate limit headers Discord
+    sends back.
+    Reads those headers through on_request_end, which belongs in the bot's
+    HTTP session's aiohttp.TraceConfig.
+    """
+    def __init__(self, max_jobs: int = 2, max_fetches: int = 4):
+        self._max_jobs = max(1, max_jobs)
+        self._fetch_semaphore = asyncio.Semaphore(max(1, max_fetches))
+        self._seq = itertools.count()
+        self._waiting: list[BackfillTicket] = []  # heap
+        self._running: set[BackfillTicket] = set()
+        # Event loop times until which history requests should hold off.
+        # Key: channel ID
+        self._resume_at: dict[int, float] = {}
+        self._global_resume_at = 0.0
+
+
+    def enqueue(self, priority: int = 0) -> BackfillTicket:
+        """
+        Get in line to run a job. Lower priorities go first; jobs with the same
+        priority go in the order they were enqueued.
+        """
+        ticket = BackfillTicket(self, priority, next(self._seq))
+        heapq.heappush(self._waiting, ticket)
+        self._promote()
+        return ticket
+
+
+    def position(self, ticket: BackfillTicket) -> int:
+        if ticket not in self._waiting:
+            return 0
+        # Everything running now is ahead of it too.
+        return len(self._running) + sum(
+            1 for other in self._waiting if other < ticket
+        )
+
+
+    def release(self, ticket: BackfillTicket) -> None:
+        if ticket in self._running:
+            self._running.remove(ticket)
+        elif ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+        self._promote()
+
+
+    def _promote(self) -> None:
+        while len(self._running) < self._max_jobs and len(self._waiting) > 0:
+            ticket = heapq.heappop(self._waiting)
+            self._running.add(ticket)
+            ticket._started.set()
+
+
+    @asynccontextmanager
+    async def fetch(self, channel_id: int) -> AsyncIterator[None]:
+        """
+        Hold one of the limited slots for requesting channel history, waiting
+        out the channel's rate limit first if it has run dry.
+        """
+        async with self._fetch_semaphore:
+            loop = asyncio.get_running_loop()
+            while True:
+                resume_at = max(
+                    self._resume_at.get(channel_id, 0.0),
+                    self._global_resume_at,
+                )
+                delay = resume_at - loop.time()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self._resume_at.pop(channel_id, None)
+            yield
+
+
+    async def on_request_end(
+        self,
+        session: aiohttp.ClientSession,
+        trace_config_ctx: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        if params.method != "GET":
+            return
+        match = HISTORY_PATH.search(params.url.path)
+        if match is None:
+            return
+
+        limit = retry_delay(params.response)
+        if limit is None:
+            return
+        delay, is_global = limit
+
+        resume_at = asyncio.get_running_loop().time() + delay
+        if is_global:
+            self._global_resume_at = max(self._global_resume_at, resume_at)
+        else:
+            channel_id = int(match.group(1))
+            self._resume_at[channel_id] = max(
+                self._resume_at.get(channel_id, 0.0),
+                resume_at,
+            )
+
+
+__all__ = ["BackfillScheduler", "BackfillTicket"]
@@ -2,6 +2,13 @@ from discord.ext import commands
 import config
 
 
+# The imitate command's cooldown. Replying to an imitation counts against it
+# too, so that replying isn't a way around it.
+imitate_cooldown = commands.CooldownMapping.from_cooldown(
+    2, 2, commands.BucketType.user
+)
+
+
 def is_owner(ctx: commands.Context) -> bool:
     """ Check if the context's author is an owner of Parrot. """
     return ctx.author.id in ctx.bot.owner_ids
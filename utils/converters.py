@@ -2,11 +2,9 @@ from typing import Awaitable, Callable
 from discord.ext import commands
 from discord import Member, User
 
-from discord.errors import NotFound
 from utils.exceptions import UserNotFoundError
 
 import re
-import random
 import config
 
 
@@ -43,13 +41,16 @@ class BaseUserlike(commands.Converter):
         except ValueError:
             raise self._user_not_found(text)
 
+        # Mentions come with the member attached.
+        for member in ctx.message.mentions:
+            if member.id == user_id and isinstance(member, Member):
+                return member
+
         # Fetch the member by ID.
-        try:
-            return await ctx.guild.fetch_member(user_id)
-        except NotFound:
+        member = await ctx.bot.member_cache.fetch(ctx.guild, user_id)
+        if member is None:
             raise self._user_not_found(text)
-
-        raise self._user_not_found(text)
+        return member
 
 
 class Userlike(BaseUserlike):
@@ -81,6 +82,16 @@ class FuzzyUserlike(Userlike):
         # Get the author of the last message send in the channel who isn't
         # Parrot or the person who sent this command.
         if text in ("you", "yourself", "previous"):
+            # Parrot keeps track of who spoke last in each channel as messages
+            # come in. Only dig through the channel's history if it hasn't
+            # been watching this channel for long enough to know.
+            known, author = ctx.bot.recent_speakers.last(
+                ctx.channel.id,
+                before=ctx.message.id,
+                exclude=(ctx.bot.user.id, ctx.author.id),
+            )
+            if known:
+                return author
             async for message in ctx.channel.history(
                 before=ctx.message,
                 limit=50
@@ -93,22 +104,30 @@ class FuzzyUserlike(Userlike):
                     # users, not members, so we have to fetch the member
                     # separately.
                     if ctx.guild is not None:
-                        return await ctx.guild.fetch_member(message.author.id)
+                        return await ctx.bot.member_cache.fetch(
+                            ctx.guild,
+                            message.author.id,
+                        )
                     return message.author
 
-    # Choose a random registered user in this channel.
+    # Choose a random registered user in this server.
     async def _someone(self, ctx, text):
         if text in ("someone", "somebody", "anyone", "anybody"):
             if not config.ENABLE_IMITATE_SOMEONE:
                 raise UserNotFoundError('The "|imitate someone" feature is disabled.')
             if ctx.guild is None:
                 return ctx.author
-            # list of users who are both in this channel and registered
-            registered_users_here = filter(
-                lambda user: (
-                    user.id in ctx.bot.registered_users or
-                    (user.bot and user.id != ctx.bot.user.id)
-                ),
-                ctx.guild.members
+            # Pick from the registered members of this server who Parrot has
+            # data for. Someone might have left without Parrot noticing, so
+            # try a few times.
+            for _ in range(3):
+                user_id = ctx.bot.member_index.choice(ctx.guild.id)
+                if user_id is None:
+                    break
+                member = await ctx.bot.member_cache.fetch(ctx.guild, user_id)
+                if member is not None:
+                    return member
+                ctx.bot.member_index.remove(ctx.guild.id, user_id)
+            raise UserNotFoundError(
+                "Parrot doesn't know anyone in this server to imitate yet."
             )
-            return random.choice(tuple(registered_users_here))
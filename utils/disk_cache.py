@@ -0,0 +1,119 @@
+from collections import OrderedDict
+
+import asyncio
+import os
+import re
+import tempfile
+
+
+class DiskCache:
+    """
+    A directory of files named after keys that identify their contents,
+    evicting the least recently used files once they take up more than
+    [max_bytes] altogether.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        # Key: file name; value: file size in bytes
+        # Least recently used first.
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._num_bytes = 0
+
+        # Pick up where the last run left off. File modification times stand
+        # in for when each entry was last used.
+        files = [entry for entry in os.scandir(directory) if entry.is_file()]
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files:
+            # Leftovers from a write that got interrupted.
+            if entry.name.endswith(".tmp"):
+                os.remove(entry.path)
+                continue
+            size = entry.stat().st_size
+            self._entries[entry.name] = size
+            self._num_bytes += size
+        self._evict()
+
+
+    async def get(self, key: str) -> bytes | None:
+        """ Get a file's contents, or None if it isn't cached. """
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self._read, self._path(key))
+        except FileNotFoundError:
+            # Someone cleaned up the directory behind our back.
+            self._remove(key)
+            return None
+
+
+    async def put(self, key: str, data: bytes) -> None:
+        """ Cache a file, replacing any file already cached under this key. """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, self._path(key), data)
+        self._remove(key)
+        self._entries[key] = len(data)
+        self._num_bytes += len(data)
+        self._evict()
+
+
+    def _path(self, key: str) -> str:
+        if re.fullmatch(r"[\w.-]+", key) is None or key.startswith("."):
+            raise ValueError(f"Invalid cache key: {key}")
+        return os.path.join(self.directory, key)
+
+
+    def _remove(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._num_bytes -= size
+
+
+    def _evict(self) -> None:
+        while self._num_bytes > self.max_bytes and len(self._entries) > 0:
+            key, size = self._entries.popitem(last=False)
+            self._num_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except FileNotFoundError:
+                pass
+
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            data = f.read()
+        # Mark the file as recently used for the next time the cache starts.
+        os.utime(path)
+        return data
+
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        # Write to a temporary file first so a crash can't leave half a file
+        # under the real name. Each write gets its own, since two of them can
+        # be putting the same key at once.
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            prefix=".",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+__all__ = ["DiskCache"]
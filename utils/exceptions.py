@@ -31,3 +31,14 @@ class AlreadyScanning(FriendlyError):
     A user tried to run Quickstart in a channel that Quickstart is already
     scanning for them.
     """
+
+
+class SendQueueFull(FriendlyError):
+    """
+    Too many imitations are already waiting to be sent in a channel to take
+    another one.
+    """
+
+
+class SendExpired(FriendlyError):
+    """ An imitation waited too long to be sent and was given up on. """
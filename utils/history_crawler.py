@@ -1,6 +1,8 @@
 from typing import AsyncIterator, Callable
 from discord import Message
 
+import asyncio
+
 
 def dummy_filter(message: Message) -> bool:
     return True
@@ -10,15 +12,21 @@ class HistoryCrawler:
     def __init__(
         self,
         histories: AsyncIterator | list[AsyncIterator],
-        action: Callable[[Message], bool],
+        action: Callable[[list[Message]], int],
         limit: int = 100_000,
-        filter: Callable[[Message], bool] = dummy_filter
+        filter: Callable[[Message], bool] = dummy_filter,
+        concurrency: int = 4,
+        batch_size: int = 100,
     ):
         self.num_collected = 0
         self.running = True
         self._action = action
         self._limit = limit
         self._filter = filter
+        self._concurrency = max(1, concurrency)
+        self._batch_size = max(1, batch_size)
+        self._batch: list[Message] = []
+        self._tasks: list[asyncio.Task] = []
         if isinstance(histories, list):
             self._histories = histories
         else:
@@ -26,23 +34,74 @@ class HistoryCrawler:
 
     async def crawl(self) -> None:
         """
-        Iterate over up to [limit] messages in the channel in
-        reverse-chronological order.
+        Iterate over up to [limit] messages across all the histories in
+        reverse-chronological order, scanning up to [concurrency] histories at
+        a time.
+        Matching messages are handed to [action] in batches of up to
+        [batch_size]; [action] returns how many of them it collected.
         """
-        for history in self._histories:
-            async for message in history:
-                if not self.running:
-                    break
-                if not self._filter(message):
-                    continue
-                if self._action(message):
-                    self.num_collected += 1
-                if self.num_collected >= self._limit:
-                    break
-        self.running = False
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def crawl_one(history: AsyncIterator) -> None:
+            async with semaphore:
+                # Check whether to go on before taking each message, not
+                # after, so nothing gets taken from the history only to be
+                # thrown away.
+                while self.running:
+                    try:
+                        message = await anext(history)
+                    except StopAsyncIteration:
+                        break
+                    if not self._filter(message):
+                        continue
+                    self._batch.append(message)
+                    # Flush early once this batch could take the crawl to its
+                    # limit, so that it never holds more than it can collect.
+                    if (
+                        len(self._batch) < self._batch_size and
+                        self.num_collected + len(self._batch) < self._limit
+                    ):
+                        continue
+                    self._flush()
+                    # The limit is shared between all the histories, so
+                    # reaching it stops every other scan too.
+                    if self.num_collected >= self._limit:
+                        self.stop()
+                        break
+
+        self._tasks = [
+            asyncio.create_task(crawl_one(history))
+            for history in self._histories
+        ]
+        try:
+            results = await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._flush()
+        finally:
+            self.running = False
+        # Scans cut short by stop() end up cancelled; anything else is a real
+        # error.
+        for result in results:
+            if (
+                isinstance(result, BaseException) and
+                not isinstance(result, asyncio.CancelledError)
+            ):
+                raise result
+
+    def _flush(self) -> None:
+        """ Hand the pending batch of messages to the action. """
+        if len(self._batch) == 0:
+            return
+        batch = self._batch
+        self._batch = []
+        self.num_collected += self._action(batch)
 
     def stop(self) -> None:
         self.running = False
+        # Don't leave the other scans waiting around for their next message.
+        current_task = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current_task:
+                task.cancel()
 
 
 __all__ = ["HistoryCrawler"]
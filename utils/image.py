@@ -10,11 +10,15 @@ from typing import Any, Callable, Mapping
 from discord import User
 
 import logging
+import math
 import aiohttp
+import numpy as np
 from PIL import Image, ImageSequence, ImageOps
 
 from assets import GIF_RULES, IMAGE_RULES
-from utils import executor_function, tag
+from utils import tag
+from utils.disk_cache import DiskCache
+from utils.image_workers import ImageWorkerPool
 
 
 def gif_frame_transparency(img: Image.Image) -> Image.Image:
@@ -53,21 +57,20 @@ def image_to_buffer(
     return fp
 
 
-async def fetch_image(url: str) -> Image.Image:
-    """ Determine type of input, return image file. """
-    session = aiohttp.ClientSession()
-    try:
-        async with session.get(url, allow_redirects=False) as response:
-            img_bytes = await response.read()
-    except Exception as e:
-        await session.close()
-        raise e
-    await session.close()
-    return Image.open(BytesIO(img_bytes))
+async def fetch_image(http_session: aiohttp.ClientSession, url: str) -> bytes:
+    """ Download an image's bytes. """
+    async with http_session.get(url, allow_redirects=False) as response:
+        response.raise_for_status()
+        return await response.read()
 
 
-# below are the blocking image functions (that support GIF) which require the
-# executor_function wrapper
+def image_format(img_bytes: bytes) -> str:
+    """ Get the format of an encoded image, like "GIF", from its header. """
+    return Image.open(BytesIO(img_bytes)).format
+
+
+# below are the blocking image functions (that support GIF), which run in an
+# image worker process
 def invert_flip_img(img: Image.Image, _) -> Image.Image:
     # get image size, resize if too big
     width, height = img.size
@@ -87,8 +90,183 @@ def resize_img(img: Image.Image, scale: float) -> Image.Image:
     width, height = img.size
     return img.resize(
         (int(width * scale), int(height * scale)),
-        resample=Image.ANTIALIAS
+        resample=Image.LANCZOS
+    )
+
+
+# Alpha values at or below this are treated as fully transparent in GIFs.
+GIF_ALPHA_THRESHOLD = 88
+
+# Build animated avatars' shared palette from up to this many frames.
+PALETTE_SAMPLE_FRAMES = 16
+
+# Longest side of the small GIF encoded to predict how big the real one will be.
+PROBE_SIDE = 96
+
+# Aim a little under the file size limit, since size predictions are rough.
+SIZE_MARGIN = 0.9
+
+# Give up on fitting a GIF under the file size limit after this many encodes.
+MAX_ENCODES = 3
+
+
+def decode_frames(
+    img: Image.Image,
+    scale: float = 1,
+    max_side: int | None = None
+) -> tuple[np.ndarray, list[int]]:
+    """
+    Decode every frame of an animated image into one RGBA array shaped
+    (frames, height, width, 4), along with each frame's duration.
+    """
+    width, height = img.size
+    if max_side is not None and max(width, height) * scale > max_side:
+        scale = max_side / max(width, height)
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+    frames: list[np.ndarray] = []
+    durations: list[int] = []
+    for frame in ImageSequence.Iterator(img):
+        durations.append(frame.info.get("duration", 100))
+        rgba = frame.convert("RGBA")
+        if rgba.size != size:
+            rgba = rgba.resize(size, resample=Image.BICUBIC)
+        frames.append(np.asarray(rgba))
+    return np.stack(frames), durations
+
+
+def resize_frames(frames: np.ndarray, scale: float) -> np.ndarray:
+    """ Scale every frame in a stack by the same amount. """
+    _, height, width, _ = frames.shape
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return np.stack([
+        np.asarray(Image.fromarray(frame).resize(size, resample=Image.LANCZOS))
+        for frame in frames
+    ])
+
+
+def invert_flip_frames(frames: np.ndarray) -> np.ndarray:
+    """ Mirror and invert (all but the alpha of) a whole stack of frames. """
+    frames = frames[:, :, ::-1].copy()
+    frames[..., :3] = 255 - frames[..., :3]
+    return frames
+
+
+def encode_gif(
+    frames: np.ndarray,
+    durations: list[int],
+    loop: int | None
+) -> BytesIO:
+    """
+    Encode a stack of RGBA frames as a GIF, quantizing them all to one palette
+    with index 255 reserved for transparency.
+    """
+    n_frames, height, width, _ = frames.shape
+    rgb = np.ascontiguousarray(frames[..., :3])
+
+    # Build a 255-color palette from a sample of the frames stacked on top of
+    # each other, then map every frame to it in one go.
+    step = max(1, n_frames // PALETTE_SAMPLE_FRAMES)
+    sample = rgb[::step].reshape(-1, width, 3)
+    palette_img = Image.fromarray(sample).quantize(colors=255)
+    indices = Image.fromarray(rgb.reshape(-1, width, 3)).quantize(
+        palette=palette_img,
+        dither=Image.Dither.NONE,
     )
+    indices = np.asarray(indices).reshape(n_frames, height, width).copy()
+    indices[frames[..., 3] <= GIF_ALPHA_THRESHOLD] = 255
+
+    palette = palette_img.getpalette()[:255 * 3]
+    palette += [0] * (256 * 3 - len(palette))
+    images = []
+    for frame_indices in indices:
+        image = Image.frombytes("P", (width, height), frame_indices.tobytes())
+        image.putpalette(palette)
+        images.append(image)
+
+    fp = BytesIO()
+    save_options = {}
+    if loop is not None:
+        save_options["loop"] = loop
+    images[0].save(
+        fp,
+        format="GIF",
+        save_all=True,
+        append_images=images[1:],
+        duration=durations,
+        transparency=255,
+        disposal=2,
+        **save_options,
+    )
+    fp.seek(0)
+    return fp
+
+
+def estimate_gif_scale(
+    frames: np.ndarray,
+    durations: list[int],
+    loop: int | None,
+    max_bytes: int
+) -> float:
+    """
+    Guess the biggest scale (up to 1) these frames can be encoded at without
+    the GIF going over max_bytes.
+    Encodes a small probe made of some of the frames, then assumes the full GIF
+    takes as many bytes per pixel as the probe did. Small GIFs compress worse
+    than big ones, so this tends to guess a little low rather than too high.
+    """
+    n_frames, height, width, _ = frames.shape
+    step = max(1, n_frames // PALETTE_SAMPLE_FRAMES)
+    probe = resize_frames(frames[::step], min(1, PROBE_SIDE / max(width, height)))
+    probe_bytes = encode_gif(probe, durations[::step], loop).getbuffer().nbytes
+    bytes_per_pixel = probe_bytes / probe[..., 0].size
+    predicted_bytes = bytes_per_pixel * n_frames * height * width
+    return min(1, math.sqrt(max_bytes / predicted_bytes) * SIZE_MARGIN)
+
+
+def encode_gif_to_fit(
+    frames: np.ndarray,
+    durations: list[int],
+    loop: int | None,
+    max_bytes: int
+) -> BytesIO:
+    """
+    Encode a GIF that comes in under max_bytes, usually in one encode.
+    GIFs don't have a quality setting to turn down, so only the scale changes.
+    """
+    scale = estimate_gif_scale(frames, durations, loop, max_bytes)
+    for _ in range(MAX_ENCODES):
+        scaled = frames if scale >= 1 else resize_frames(frames, scale)
+        fp = encode_gif(scaled, durations, loop)
+        n_bytes = fp.getbuffer().nbytes
+        if n_bytes <= max_bytes:
+            break
+        # The guess was too big. File size goes roughly with pixel count, which
+        # goes with the square of the scale, so correct by the square root.
+        scale *= math.sqrt(max_bytes / n_bytes) * SIZE_MARGIN
+    return fp
+
+
+def process_animated(img: Image.Image, effect: str, arg: float) -> BytesIO:
+    """
+    Process all of an animated image's frames at once as one array instead of
+    one at a time.
+    """
+    # If a GIF loops, it has info["loop"]; if not, then the key does not exist.
+    loop = img.info.get("loop")
+    if effect == "invertflip":
+        frames, durations = decode_frames(img, max_side=500)
+        frames = invert_flip_frames(frames)
+        # Size the GIF to fit Discord's file size limit in the same step
+        # instead of encoding it over and over until it does.
+        return encode_gif_to_fit(
+            frames,
+            durations,
+            loop,
+            IMAGE_RULES["max_filesize"],
+        )
+    frames, durations = decode_frames(img, scale=arg)
+    return encode_gif(frames, durations, loop)
 
 
 IMG_PROCESS_FUNCTIONS: Mapping[str, Callable[Image.Image, Any]] = {
@@ -97,8 +275,10 @@ IMG_PROCESS_FUNCTIONS: Mapping[str, Callable[Image.Image, Any]] = {
 }
 
 
-@executor_function
 def process_lower_level(img: Image.Image, effect: str, arg: int) -> BytesIO:
+    if getattr(img, "is_animated", False):
+        return process_animated(img, effect, arg)
+
     # this will only loop once for still images
     frames: list[Image.Image] = []
     durations: list[int] = []
@@ -117,32 +297,60 @@ def process_lower_level(img: Image.Image, effect: str, arg: int) -> BytesIO:
     return fp
 
 
-async def modify_avatar(user: User) -> tuple[BytesIO, str]:
-    # grab user image and covert to RGBA
-    img = await fetch_image(user.avatar.url)
+def process_avatar(source_bytes: bytes) -> bytes:
+    """
+    Make the modified version of an avatar: mirrored, inverted, and small
+    enough to upload to Discord.
+    """
+    img = Image.open(BytesIO(source_bytes))
     is_gif = getattr(img, "is_animated", False)
 
-    if is_gif:
-        if img.n_frames > GIF_RULES["max_frames"]:
-            raise NotImplementedError("GIF too long; need to process only first frame")
-            return None, None
-        else:
-            logging.info(
-                f"Processing GIF avatar for {tag(user)}... ",
-                f"{img.width} \u2A09 {img.height} pixels · {img.n_frames} frames"
-            )
+    if is_gif and img.n_frames > GIF_RULES["max_frames"]:
+        raise NotImplementedError("GIF too long; need to process only first frame")
 
     # original image begins processing
-    fp = await process_lower_level(img, "invertflip", 0)
+    fp = process_lower_level(img, "invertflip", 0)
     n_bytes = fp.getbuffer().nbytes
 
     # if file too large to send via Discord, then resize
+    # Animated avatars are already sized to fit, so this is only a last resort
+    # for them.
     while n_bytes > IMAGE_RULES["max_filesize"]:
         # recursively resize image until it meets Discord filesize limit
         img = Image.open(fp)
         scale = 0.9 * IMAGE_RULES["max_filesize"] / n_bytes  # 0.9x bias to help ensure it comes in under max size
-        fp = await process_lower_level(img, "resize", scale)
+        fp = process_lower_level(img, "resize", scale)
         n_bytes = fp.getbuffer().nbytes
 
+    return fp.getvalue()
+
+
+async def modify_avatar(
+    user: User,
+    http_session: aiohttp.ClientSession,
+    cache: DiskCache,
+    workers: ImageWorkerPool
+) -> tuple[BytesIO, str]:
+    # Avatar hashes change whenever the avatar does, so the same hash always
+    # means the same image.
+    avatar = user.display_avatar
+    modified_key = f"{avatar.key}.modified"
+    modified_bytes = await cache.get(modified_key)
+    if modified_bytes is not None:
+        logging.info(f"Using cached modified avatar for {tag(user)}")
+        return BytesIO(modified_bytes), image_format(modified_bytes)
+
+    source_key = f"{avatar.key}.source"
+    source_bytes = await cache.get(source_key)
+    if source_bytes is None:
+        source_bytes = await fetch_image(http_session, avatar.url)
+        await cache.put(source_key, source_bytes)
+
+    logging.info(
+        f"Processing {'animated ' if avatar.is_animated() else ''}avatar for "
+        f"{tag(user)}..."
+    )
+    modified_bytes = await workers.run(process_avatar, source_bytes)
+    await cache.put(modified_key, modified_bytes)
     logging.info(f"Processed new avatar for {tag(user)}")
-    return fp, img.format
+    return BytesIO(modified_bytes), image_format(modified_bytes)
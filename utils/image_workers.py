@@ -0,0 +1,70 @@
+from typing import Any, Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import asyncio
+import functools
+import multiprocessing
+
+
+class ImageWorkersBusy(Exception):
+    """ Too many images are already waiting to be processed. """
+
+
+class ImageWorkerPool:
+    """
+    Worker processes dedicated to image processing, so that it neither holds
+    the GIL in the bot's process nor ties up the default thread pool that
+    model builds run in.
+    Only so many jobs can wait for a worker at once; past that, new jobs are
+    turned away instead of piling up.
+    """
+    def __init__(self, max_workers: int = 2, max_queued: int = 8):
+        self._max_workers = max(1, max_workers)
+        self._max_jobs = self._max_workers + max(0, max_queued)
+        self._num_jobs = 0
+        self._executor = self._new_executor()
+
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Start workers fresh instead of forking the bot, which has an event
+        # loop and threads running by the time the first image comes in.
+        return ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+
+    async def run(self, function: Callable, *args) -> Any:
+        """
+        Run a function in a worker process and return its result.
+        The function and its arguments and result must all be picklable.
+        """
+        if self._num_jobs >= self._max_jobs:
+            raise ImageWorkersBusy(
+                f"{self._num_jobs} image jobs are already queued or running."
+            )
+        self._num_jobs += 1
+        executor = self._executor
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                executor,
+                functools.partial(function, *args)
+            )
+        except BrokenProcessPool:
+            # A worker died (probably out of memory), which takes the whole
+            # pool down with it. Start a new one for the next job.
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            raise
+        finally:
+            self._num_jobs -= 1
+
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = ["ImageWorkerPool", "ImageWorkersBusy"]
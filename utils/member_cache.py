@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from discord import Guild, Member
+from discord.errors import NotFound
+
+import time
+
+
+class MemberCache:
+    """
+    Remembers which users are (or aren't) members of which guilds for a little
+    while, so that looking the same person up again doesn't cost a request.
+    """
+    def __init__(self, ttl: float = 300, maxsize: int = 4096):
+        self._ttl = ttl
+        self._maxsize = maxsize
+        # Key: (guild ID, user ID)
+        # Value: (time the entry expires, the member or None if they aren't one)
+        self._entries: OrderedDict[
+            tuple[int, int],
+            tuple[float, Member | None]
+        ] = OrderedDict()
+
+
+    async def fetch(self, guild: Guild, user_id: int) -> Member | None:
+        """ Get a member of a guild, or None if the user isn't in it. """
+        # The gateway's member cache is always the freshest.
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        # If the gateway has sent every member of this guild, the user just
+        # isn't in it.
+        if guild.chunked:
+            return None
+
+        key = (guild.id, user_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, member = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return member
+            del self._entries[key]
+
+        try:
+            member = await guild.fetch_member(user_id)
+        except NotFound:
+            member = None
+        self._store(key, member)
+        return member
+
+
+    def put(self, member: Member) -> None:
+        """ Remember a member that came in some other way. """
+        self._store((member.guild.id, member.id), member)
+
+
+    def forget(self, guild_id: int, user_id: int) -> None:
+        self._entries.pop((guild_id, user_id), None)
+
+
+    def _store(self, key: tuple[int, int], member: Member | None) -> None:
+        self._entries[key] = (time.monotonic() + self._ttl, member)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+
+__all__ = ["MemberCache"]
@@ -1,3 +1,4 @@
+import functools
 import markovify
 import random
 from utils import executor_function
@@ -18,40 +19,58 @@ class ParrotMarkov(markovify.Text):
         return cls(*args, **kwargs)
 
 
-class GibberishMarkov(markovify.Text):
+class GibberishMarkov:
     """
-    Feed the corpus to the Markov model character-by-character instead of
-    word-by-word for extra craziness!
+    A Markov chain that goes character-by-character instead of word-by-word
+    for extra craziness!
+    Each state is the last few characters, and maps to a string of every
+    character that ever came after them, repeats included, so that picking one
+    at random picks them as often as they came up.
     """
+    # Marks the beginning and end of the text. Nobody types this.
+    BOUNDARY = "\0"
+
+    # Most characters Discord allows in one message.
+    MAX_LENGTH = 2000
+
     def __init__(self, text: str):
-        super().__init__(
-            None,
-            parsed_sentences=[list(text)],
-            state_size=random.randint(1, 2),
-            retain_original=False,
-            well_formed=False,
-        )
         self.original = text
+        self.state_size = random.randint(1, 2)
+        padded = self.BOUNDARY * self.state_size + text + self.BOUNDARY
+        followers: dict[str, list[str]] = {}
+        for i in range(len(text) + 1):
+            state = padded[i:i + self.state_size]
+            followers.setdefault(state, []).append(padded[i + self.state_size])
+        self.chain = {
+            state: "".join(chars) for state, chars in followers.items()
+        }
 
+    # The same message tends to get gibberized over and over, so keep the
+    # chains for the latest texts around.
     @classmethod
-    @executor_function
-    def new(cls, *args, **kwargs):
-        return cls(*args, **kwargs)
+    @functools.lru_cache(maxsize=256)
+    def for_text(cls, text: str) -> "GibberishMarkov":
+        return cls(text)
 
-    def word_join(self, words: list[str]) -> str:
-        # The generator usually puts spaces between each entry in the list
-        # because it expects them to be words. Since they're actually characters
-        # here, we join the list without spaces.
-        # I could be smarter about this and make it use a string instead of a
-        # list of strings, but I would have to modify markovify.Chain to do that
-        # and I don't want to!
-        return "".join(words)
-
-    def make_sentence(self, init_state=None, **kwargs):
-        # Make some gibberish. If it ends up the same as the original text,
-        # maybe try again. But not always, because sometimes it's funny!
-        acceptable = False
-        while not acceptable:
-            sentence = super().make_sentence(init_state=init_state, **kwargs)
-            acceptable = sentence != self.original or random.random() < 0.5
+    @classmethod
+    @executor_function
+    def gibberize(cls, text: str) -> str:
+        """ Turn text into gibberish, start to finish in a worker thread. """
+        model = cls.for_text(text)
+        # Try up to 10 times to make it not the same as the source text.
+        for _ in range(10):
+            sentence = model.make_sentence()
+            if sentence != text:
+                break
         return sentence
+
+    def make_sentence(self) -> str:
+        state = self.BOUNDARY * self.state_size
+        characters = []
+        while len(characters) < self.MAX_LENGTH:
+            character = random.choice(self.chain[state])
+            if character == self.BOUNDARY:
+                break
+            characters.append(character)
+            state = state[1:] + character
+        return "".join(characters)
@@ -0,0 +1,74 @@
+from typing import Iterable
+from collections import OrderedDict, deque
+from discord import Member, Message, User
+
+
+class RecentSpeakers:
+    """
+    The authors of the last few messages in each channel, as they come in over
+    the gateway, so that finding who spoke last doesn't take a trip through
+    the channel's history.
+    """
+    def __init__(self, size: int = 50, max_channels: int = 1024):
+        self._size = size
+        self._max_channels = max_channels
+        # Key: channel ID
+        # Value: (message ID, author) of the latest messages, oldest first
+        self._channels: OrderedDict[
+            int,
+            deque[tuple[int, User | Member]]
+        ] = OrderedDict()
+
+
+    def record(self, message: Message) -> None:
+        # Webhook messages are imitations, not people.
+        if message.webhook_id is not None:
+            return
+        speakers = self._channels.get(message.channel.id)
+        if speakers is None:
+            speakers = deque(maxlen=self._size)
+            self._channels[message.channel.id] = speakers
+            while len(self._channels) > self._max_channels:
+                self._channels.popitem(last=False)
+        else:
+            self._channels.move_to_end(message.channel.id)
+        speakers.append((message.id, message.author))
+
+
+    def forget(self, channel_id: int, message_ids: Iterable[int]) -> None:
+        """ Drop deleted messages. """
+        speakers = self._channels.get(channel_id)
+        if speakers is None:
+            return
+        message_ids = set(message_ids)
+        kept = [entry for entry in speakers if entry[0] not in message_ids]
+        if len(kept) < len(speakers):
+            speakers.clear()
+            speakers.extend(kept)
+
+
+    def last(
+        self,
+        channel_id: int,
+        before: int,
+        exclude: Iterable[int],
+    ) -> tuple[bool, User | Member | None]:
+        """
+        Find the author of the latest message before message ID [before] who
+        isn't one of the users in [exclude].
+        The first value is False if Parrot hasn't seen enough of this
+        channel to tell, in which case the channel history has to be checked.
+        """
+        speakers = self._channels.get(channel_id)
+        if speakers is None:
+            return False, None
+        exclude = set(exclude)
+        for message_id, author in reversed(speakers):
+            if message_id < before and author.id not in exclude:
+                return True, author
+        # Nobody else spoke in the last [size] messages Parrot saw. That only
+        # settles it if that's as far back as anyone would look anyway.
+        return len(speakers) == self._size, None
+
+
+__all__ = ["RecentSpeakers"]
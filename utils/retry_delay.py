@@ -0,0 +1,20 @@
+import aiohttp
+
+
+def retry_delay(response: aiohttp.ClientResponse) -> tuple[float, bool] | None:
+    """
+    Read how long to hold off on a route from the rate limit headers Discord
+    sent back with a response, and whether the limit is the global one.
+    Returns None if the route can still be used right away.
+    """
+    headers = response.headers
+    try:
+        if response.status == 429:
+            delay = float(headers.get("Retry-After", 1))
+        elif headers.get("X-RateLimit-Remaining") == "0":
+            delay = float(headers.get("X-RateLimit-Reset-After", 1))
+        else:
+            return None
+    except ValueError:
+        return None
+    return delay, bool(headers.get("X-RateLimit-Global"))
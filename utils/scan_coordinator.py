@@ -0,0 +1,323 @@
+from typing import Callable
+from collections import deque
+from datetime import datetime
+from discord import Message, Object, TextChannel
+from discord.utils import time_snowflake
+from database.checkpoint_manager import Checkpoint, CheckpointManager
+from utils.backfill_scheduler import BackfillScheduler
+
+import asyncio
+import logging
+
+
+class ScanFeed:
+    """
+    The messages one user posted in a channel, as found by a scan shared with
+    every other Quickstart looking at that channel.
+    Works as an async iterator, so a HistoryCrawler can consume it like a
+    channel history.
+    """
+    def __init__(
+        self,
+        scan: "ChannelScan",
+        user_id: int,
+        after: datetime | None,
+        limit: int,
+        checkpoints: CheckpointManager | None = None,
+    ):
+        self.user_id = user_id
+        # Only messages with IDs above this one are wanted.
+        self.floor = time_snowflake(after) if after is not None else 0
+        # Range of message IDs that an earlier Quickstart already scanned, so
+        # this one doesn't have to.
+        self.gap: tuple[int, int] | None = None
+        # ID of the last message the scan read before this feed attached, or
+        # None if it attached before the scan read anything. Anything newer
+        # than this has to be picked up in another pass.
+        self.joined_below: int | None = None
+        # Scan up to this many messages for this feed.
+        self.limit = limit
+        self.num_scanned = 0
+        self.finished = False
+        self._scan = scan
+        # Messages found by the scan that the consumer has yet to take.
+        self._pending: deque[Message] = deque()
+        self._wakeup = asyncio.Event()
+
+        # Resume from where the last Quickstart left off.
+        self._checkpoints = checkpoints
+        self._base: Checkpoint | None = None
+        if checkpoints is not None:
+            self._base = checkpoints.get(user_id, scan.channel.id)
+        if self._base is not None:
+            if self._base.complete:
+                self.floor = max(self.floor, self._base.newest_id)
+            else:
+                self.gap = (self._base.oldest_id, self._base.newest_id)
+
+        # Progress through the current pass, for the checkpoint.
+        self._top: int | None = None
+        self._bottom: int | None = None
+        self._reached_gap = False
+        self._reached_floor = False
+        # Whether this feed joined a pass late and is now in its follow-up.
+        self._late = False
+
+    def __aiter__(self) -> "ScanFeed":
+        return self
+
+    async def __anext__(self) -> Message:
+        while len(self._pending) == 0:
+            if self.finished:
+                raise StopAsyncIteration
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self._pending.popleft()
+
+    def needs(self, message: Message) -> bool:
+        """ Whether this feed still needs the pass to go this far back. """
+        return message.id > self.floor and self.num_scanned < self.limit
+
+    def already_has(self, message: Message) -> bool:
+        return (
+            self.gap is not None and
+            self.gap[0] <= message.id <= self.gap[1]
+        )
+
+    def track(self, message: Message) -> None:
+        """ Note that the scan read this message on this feed's behalf. """
+        # Late joiners only get part of this pass, so it doesn't count towards
+        # their checkpoint.
+        if self.joined_below is not None:
+            return
+        if self._top is None:
+            self._top = message.id
+        self._bottom = message.id
+        if self.gap is not None and message.id <= self.gap[1]:
+            self._reached_gap = True
+
+    def put(self, message: Message) -> None:
+        self.num_scanned += 1
+        if message.author.id == self.user_id:
+            self._pending.append(message)
+            self._wakeup.set()
+
+    def complete_pass(self) -> None:
+        """ Note that the scan went all the way back to this feed's floor. """
+        if self.num_scanned < self.limit:
+            self._reached_floor = True
+
+    def checkpoint(self) -> Checkpoint | None:
+        """
+        Get the checkpoint that covers everything the consumer has taken so
+        far, or None if the last one saved is still the best there is.
+        """
+        if self._top is None:
+            return None
+        bottom = self._bottom
+        reached_gap = self._reached_gap
+        reached_floor = self._reached_floor
+        # Only count messages up to the newest one the consumer hasn't taken
+        # yet; everything after it might not have been learned.
+        if len(self._pending) > 0:
+            # Untaken messages could be from either of a late joiner's passes,
+            # so there's no telling which range they leave unlearned.
+            if self._late:
+                return None
+            head = self._pending[0].id
+            bottom = head + 1
+            reached_gap = self.gap is not None and head <= self.gap[1]
+            reached_floor = False
+            if bottom > self._top:
+                return None
+
+        base = self._base
+        oldest_id = bottom
+        newest_id = self._top
+        if base is not None:
+            oldest_id = min(oldest_id, base.oldest_id)
+            newest_id = max(newest_id, base.newest_id)
+        if reached_floor:
+            return Checkpoint(oldest_id, newest_id, True)
+        if base is None:
+            return Checkpoint(bottom, self._top, False)
+        # A checkpoint can only describe one unbroken range, so this pass only
+        # counts once it has reached the range the last one already covered.
+        if not base.complete and reached_gap:
+            return Checkpoint(oldest_id, newest_id, False)
+        return None
+
+    def save(self) -> None:
+        """
+        Persist this feed's progress.
+        Call only once everything taken from the feed has been learned.
+        """
+        if self._checkpoints is None:
+            return
+        checkpoint = self.checkpoint()
+        if checkpoint is not None:
+            self._checkpoints.save(
+                self.user_id,
+                self._scan.channel.id,
+                checkpoint,
+            )
+
+    def next_pass(self) -> None:
+        """ Get ready to scan the part of the channel this feed missed. """
+        self.floor = max(self.floor, self.joined_below - 1)
+        self.joined_below = None
+        self._late = True
+
+    def finish(self) -> None:
+        """ End the feed; its consumer stops once it has read the backlog. """
+        if self.finished:
+            return
+        self.finished = True
+        self._wakeup.set()
+
+    def close(self) -> None:
+        """ Stop receiving messages from the scan. """
+        self._scan.detach(self)
+        self.finish()
+
+
+class ChannelScan:
+    """
+    Newest-to-oldest passes over a channel's history that route each message to
+    every feed attached to it.
+    """
+    # Number of messages per history request; Discord's maximum.
+    PAGE_SIZE = 100
+
+    def __init__(
+        self,
+        channel: TextChannel,
+        scheduler: BackfillScheduler,
+        on_done: Callable[["ChannelScan"], None],
+    ):
+        self.channel = channel
+        self.feeds: list[ScanFeed] = []
+        # Messages older than this one have yet to be read in the current pass.
+        self.cursor: int | None = None
+        self._scheduler = scheduler
+        self._on_done = on_done
+        self.task = asyncio.create_task(self._run())
+
+    def attach(self, feed: ScanFeed) -> None:
+        feed.joined_below = self.cursor
+        self.feeds.append(feed)
+
+    def detach(self, feed: ScanFeed) -> None:
+        if feed in self.feeds:
+            self.feeds.remove(feed)
+
+    async def _run(self) -> None:
+        try:
+            while len(self.feeds) > 0:
+                await self._pass()
+                # Feeds that were there for the whole pass have everything
+                # they need. Late joiners missed the newer part of the
+                # channel, so give them another pass over just that part.
+                for feed in list(self.feeds):
+                    if feed.joined_below is None:
+                        feed.complete_pass()
+                    if (
+                        feed.joined_below is None or
+                        feed.num_scanned >= feed.limit
+                    ):
+                        self.detach(feed)
+                        feed.finish()
+                    else:
+                        feed.next_pass()
+        except Exception as error:
+            logging.error(
+                f"Scan of channel {self.channel.id} failed: {error}"
+            )
+        finally:
+            self._on_done(self)
+            for feed in self.feeds:
+                feed.finish()
+
+    async def _pass(self) -> None:
+        self.cursor = None
+        before: Object | None = None
+        while True:
+            # Fetch one page at a time so the scheduler can pace every request.
+            async with self._scheduler.fetch(self.channel.id):
+                page = [
+                    message async for message in self.channel.history(
+                        limit=self.PAGE_SIZE,
+                        before=before,
+                        oldest_first=False,
+                    )
+                ]
+
+            for message in page:
+                needy = [feed for feed in self.feeds if feed.needs(message)]
+                if len(needy) == 0:
+                    self.cursor = None
+                    return
+                for feed in needy:
+                    feed.track(message)
+
+                # Skip past the part of the channel that everyone who's still
+                # scanning has already scanned before.
+                if all(feed.already_has(message) for feed in needy):
+                    before = Object(max(feed.gap[0] for feed in needy))
+                    self.cursor = before.id
+                    break
+
+                self.cursor = message.id
+                for feed in needy:
+                    if not feed.already_has(message):
+                        feed.put(message)
+            else:
+                if len(page) < self.PAGE_SIZE:
+                    # Reached the beginning of the channel.
+                    self.cursor = None
+                    return
+                before = Object(page[-1].id)
+
+
+class ScanCoordinator:
+    """
+    Shares channel history scans between concurrent Quickstarts so that each
+    channel is only read once no matter how many users are scanning it.
+    """
+    def __init__(
+        self,
+        scheduler: BackfillScheduler,
+        checkpoints: CheckpointManager | None = None,
+    ):
+        # Paces every history request the scans make.
+        self._scheduler = scheduler
+        self._checkpoints = checkpoints
+        # Key: channel ID
+        self._scans: dict[int, ChannelScan] = {}
+
+    def subscribe(
+        self,
+        channel: TextChannel,
+        user_id: int,
+        after: datetime | None,
+        limit: int = 100_000,
+    ) -> ScanFeed:
+        """
+        Get a feed of a user's messages in a channel since [after], joining
+        the channel's scan if one is already running. Picks up from the user's
+        last Quickstart in this channel, if they had one.
+        """
+        scan = self._scans.get(channel.id)
+        if scan is None:
+            scan = ChannelScan(channel, self._scheduler, self._forget)
+            self._scans[channel.id] = scan
+        feed = ScanFeed(scan, user_id, after, limit, self._checkpoints)
+        scan.attach(feed)
+        return feed
+
+    def _forget(self, scan: ChannelScan) -> None:
+        if self._scans.get(scan.channel.id) is scan:
+            del self._scans[scan.channel.id]
+
+
+__all__ = ["ScanCoordinator", "ScanFeed"]
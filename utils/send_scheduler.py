@@ -0,0 +1,215 @@
+from collections import deque
+from discord import AllowedMentions, NotFound, WebhookMessage
+from discord.abc import GuildChannel
+from database.webhook_manager import WebhookManager
+from utils.exceptions import SendExpired, SendQueueFull
+
+import asyncio
+import logging
+
+
+class SendRequest:
+    """ An imitation waiting to be sent, or several merged into one. """
+    def __init__(
+        self,
+        content: str,
+        username: str,
+        avatar_url: str,
+        deadline: float,
+    ):
+        self.content = content
+        self.username = username
+        self.avatar_url = avatar_url
+        # Event loop time past which this isn't worth sending anymore.
+        self.deadline = deadline
+        # One for each imitation merged into this request.
+        self.futures: list[asyncio.Future[WebhookMessage | None]] = [
+            asyncio.get_running_loop().create_future()
+        ]
+
+    @property
+    def abandoned(self) -> bool:
+        """ Whether everyone waiting on this request has stopped waiting. """
+        return all(future.done() for future in self.futures)
+
+    def merge(self, other: "SendRequest") -> None:
+        self.content += "\n" + other.content
+        self.futures.extend(other.futures)
+
+    def finish(self, message: WebhookMessage | None) -> None:
+        for future in self.futures:
+            if not future.done():
+                future.set_result(message)
+
+    def fail(self, error: Exception) -> None:
+        for future in self.futures:
+            if not future.done():
+                future.set_exception(error)
+
+
+class SendScheduler:
+    """
+    Sends imitations through each channel's webhooks from a queue per channel,
+    waiting out rate limits itself instead of leaving sends to pile up inside
+    discord.py where nobody can see them.
+    Imitations that wait past their deadline are dropped, and back-to-back
+    imitations of the same user that are close to their deadline are merged
+    into one message rather than left to expire.
+    """
+    # Most characters Discord allows in one message.
+    MAX_CONTENT_LENGTH = 2000
+
+    # How close to its deadline an imitation has to be to get merged into the
+    # one ahead of it, as a fraction of max_wait.
+    MERGE_WITHIN = 0.5
+
+    def __init__(
+        self,
+        webhooks: WebhookManager,
+        max_queued: int = 20,
+        max_wait: float = 10,
+    ):
+        self._webhooks = webhooks
+        self._max_queued = max(1, max_queued)
+        self._max_wait = max_wait
+        # Key: channel ID
+        self._queues: dict[int, deque[SendRequest]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+
+
+    def depth(self, channel_id: int | None = None) -> int:
+        """
+        How many messages are waiting to be sent in a channel, or in every
+        channel if no channel is given.
+        """
+        if channel_id is not None:
+            return len(self._queues.get(channel_id, ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+
+    async def send(
+        self,
+        channel: GuildChannel,
+        *,
+        content: str,
+        username: str,
+        avatar_url: str,
+    ) -> WebhookMessage | None:
+        """
+        Send a message through one of a channel's webhooks once the ones
+        queued before it have gone out.
+        Returns the message it went out in, which it may share with other
+        messages merged into it, or None if Parrot has no webhook in this
+        channel and can't make one.
+        Raises SendQueueFull if too many messages are already waiting here, or
+        SendExpired if this one waited too long.
+        """
+        queue = self._queues.setdefault(channel.id, deque())
+        if len(queue) >= self._max_queued:
+            raise SendQueueFull(
+                "🐢 Too many imitations are waiting to be sent in this "
+                "channel. Try again in a bit!"
+            )
+        request = SendRequest(
+            content=content,
+            username=username,
+            avatar_url=avatar_url,
+            deadline=asyncio.get_running_loop().time() + self._max_wait,
+        )
+        queue.append(request)
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.create_task(self._work(channel))
+        return await request.futures[0]
+
+
+    async def _work(self, channel: GuildChannel) -> None:
+        queue = self._queues[channel.id]
+        try:
+            while len(queue) > 0:
+                request = self._next(queue)
+                if request is None:
+                    continue
+                try:
+                    request.finish(await self._deliver(channel, request))
+                except Exception as error:
+                    request.fail(error)
+        finally:
+            del self._workers[channel.id]
+            if len(queue) == 0:
+                del self._queues[channel.id]
+
+
+    def _next(self, queue: deque[SendRequest]) -> SendRequest | None:
+        """
+        Take the next request worth sending off of the queue, with any stale
+        ones behind it that can go out in the same message merged into it.
+        """
+        request = queue.popleft()
+        if request.abandoned:
+            return None
+        now = asyncio.get_running_loop().time()
+        if request.deadline < now:
+            logging.warning(
+                f"Dropped an imitation that waited too long to send; "
+                f"{len(queue)} more waiting in this channel"
+            )
+            request.fail(self._expired())
+            return None
+        while len(queue) > 0:
+            other = queue[0]
+            if other.abandoned:
+                queue.popleft()
+                continue
+            if (
+                other.deadline - now > self._max_wait * self.MERGE_WITHIN or
+                other.username != request.username or
+                other.avatar_url != request.avatar_url or
+                len(request.content) + 1 + len(other.content) >
+                    self.MAX_CONTENT_LENGTH
+            ):
+                break
+            request.merge(queue.popleft())
+        return request
+
+
+    async def _deliver(
+        self,
+        channel: GuildChannel,
+        request: SendRequest,
+    ) -> WebhookMessage | None:
+        loop = asyncio.get_running_loop()
+        # Parrot only finds out a webhook has been deleted when sending through
+        # it fails, so give it one more try with another webhook.
+        for _ in range(2):
+            webhook = await self._webhooks.acquire(channel)
+            if webhook is None:
+                return None
+            # Wait out the webhook's rate limit here, where the wait can be
+            # given up on, rather than inside discord.py.
+            delay = self._webhooks.retry_after(webhook)
+            if loop.time() + delay > request.deadline:
+                raise self._expired()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await webhook.send(
+                    content=request.content,
+                    username=request.username,
+                    avatar_url=request.avatar_url,
+                    allowed_mentions=AllowedMentions.none(),
+                    wait=True,
+                )
+            except NotFound:
+                self._webhooks.forget(channel.id, webhook)
+        return None
+
+
+    @staticmethod
+    def _expired() -> SendExpired:
+        return SendExpired(
+            "🐢 Discord is slowing Parrot down in this channel. Try again in a "
+            "bit!"
+        )
+
+
+__all__ = ["SendScheduler"]
@@ -5,7 +5,9 @@ https://en.wikipedia.org/wiki/Weasel_program
 import asyncio
 import string
 import random
-from typing import Callable, Coroutine, TypedDict
+from typing import Callable, Coroutine
+
+import numpy as np
 
 from utils import executor_function
 from utils.syllables import find_syllables
@@ -13,12 +15,9 @@ from utils.syllables import find_syllables
 
 DEFAULT_ALPHABET = string.ascii_lowercase
 
-class Individual(TypedDict):
-    genome: str
-    fitness: int
-
-
-Population = list[Individual]
+# Each row is an individual's genome: one index into the alphabet per character.
+Population = np.ndarray  # 2D, uint8
+Fitness = np.ndarray  # 1D, one per individual
 
 
 def get_alphabet(objective: str) -> str:
@@ -30,145 +29,159 @@ def get_alphabet(objective: str) -> str:
     return "".join(alphabet)
 
 
-def initialize_individual(genome: str, fitness: int) -> Individual:
-    """Create one individual."""
-    return {"genome": genome, "fitness": fitness}
+def encode(text: str, alphabet: str) -> np.ndarray:
+    """Turn a string into a genome."""
+    index = {char: i for i, char in enumerate(alphabet)}
+    return np.array([index[char] for char in text], dtype=np.uint8)
+
 
+def decode(genome: np.ndarray, alphabet: str) -> str:
+    """Turn a genome back into a string."""
+    return "".join(alphabet[i] for i in genome)
 
-def initialize_pop(objective: str, pop_size: int) -> tuple[Population, str]:
+
+def initialize_pop(
+    rng: np.random.Generator,
+    objective: str,
+    pop_size: int
+) -> tuple[Population, str]:
     """Create population to evolve."""
     alphabet = get_alphabet(objective)
-    pop: Population = []
-    for _ in range(pop_size):
-        genome = "".join(random.choices(alphabet, k=len(objective)))
-        pop.append(initialize_individual(genome, 0))
+    # Genomes are stored as bytes, so the alphabet has to fit in one.
+    if len(alphabet) > 256:
+        raise ValueError("Too many unique characters to evolve")
+    pop = rng.integers(
+        0, len(alphabet), size=(pop_size, len(objective)), dtype=np.uint8
+    )
     return pop, alphabet
 
 
-Recombinator = Callable[[Individual, Individual], Population]
-
-def one_point_crossover(parent1: Individual, parent2: Individual) -> Population:
-    crossover_point = random.randint(1, len(parent1["genome"]) - 2)
-    # crossover_point = random.randint(0, len(parent1["genome"]) - 1)
-    child1 = parent1["genome"][:crossover_point] + parent2["genome"][crossover_point:]
-    child2 = parent2["genome"][:crossover_point] + parent1["genome"][crossover_point:]
-    return [initialize_individual(child1, 0), initialize_individual(child2, 0)]
-
-
-def n_point_crossover(parent1: Individual, parent2: Individual) -> Population:
-    raise NotImplementedError
-
-
-def uniform_crossover(parent1: Individual, parent2: Individual) -> Population:
-    raise NotImplementedError
-
-"""Recombine two parents to produce two children."""
-recombine_pair: Recombinator = one_point_crossover
-
-
-def recombine_group(parents: Population, recombine_rate: float) -> Population:
+Recombinator = Callable[
+    [np.random.Generator, Population, Population, np.ndarray],
+    tuple[Population, Population]
+]
+
+def one_point_crossover(
+    rng: np.random.Generator,
+    parents1: Population,
+    parents2: Population,
+    recombine: np.ndarray,
+) -> tuple[Population, Population]:
+    """Cross over each pair of parents at a random point, if they recombine."""
+    genome_length = parents1.shape[1]
+    crossover_points = rng.integers(1, genome_length - 1, size=len(parents1))
+    # crossover_points = rng.integers(0, genome_length, size=len(parents1))
+    swap = np.arange(genome_length) >= crossover_points[:, np.newaxis]
+    swap &= recombine[:, np.newaxis]
+    child1 = np.where(swap, parents2, parents1)
+    child2 = np.where(swap, parents1, parents2)
+    return child1, child2
+
+"""Recombine pairs of parents to produce pairs of children."""
+recombine_pairs: Recombinator = one_point_crossover
+
+
+def recombine_group(
+    rng: np.random.Generator,
+    parents: Population,
+    recombine_rate: float
+) -> Population:
     """Recombine a whole group.
 
     Pair parents 1-2, 3-4, 5-6, etc.
     Recombine at rate, else clone the parents."""
-    if len(parents[0]["genome"]) <= 2:
+    if parents.shape[1] <= 2:
         # Recombination will do nothing (worse actually -- it will crash!) if
         # the genome is too short
         return parents
-    for i in range(0, len(parents), 2):
-        if random.random() < recombine_rate:
-            child_pair = recombine_pair(parents[i], parents[i + 1])
-            parents[i] = child_pair[0]
-            parents[i + 1] = child_pair[1]
-    return parents
-
-
-Mutator = Callable[[Individual, float, str], Individual]
-
-def random_reset_mutation(parent: Individual, mutate_rate: float, alphabet: str) -> Individual:
-    genome = ""
-    for i in range(len(parent["genome"])):
-        if random.random() < mutate_rate:
-            genome += random.choice(alphabet)
-        else:
-            genome += parent["genome"][i]
-    return initialize_individual(genome, 0)
-
-
-def creep_mutation(parent: Individual, mutate_rate: float, alphabet: str) -> Individual:
-    raise NotImplementedError
-
-
-"""Mutate one individual, re-init its fitness to 0."""
-mutate_individual: Mutator = random_reset_mutation
-
-
-def mutate_group(children: Population, mutate_rate: float, alphabet: str) -> Population:
-    """Mutate a whole Population, return the mutated group."""
-    new_children = children.copy()
-    for i in range(len(children)):
-        new_children[i] = mutate_individual(children[i], mutate_rate, alphabet)
-    return new_children
-
-
-def evaluate_individual(objective: str, individual: Individual) -> None:
-    """Compute and modify the fitness for one individual.
+    num_pairs = len(parents) // 2
+    recombine = rng.random(num_pairs) < recombine_rate
+    children = parents.copy()
+    children[0:num_pairs * 2:2], children[1:num_pairs * 2:2] = recombine_pairs(
+        rng,
+        parents[0:num_pairs * 2:2],
+        parents[1:num_pairs * 2:2],
+        recombine,
+    )
+    return children
+
+
+Mutator = Callable[[np.random.Generator, Population, float, int], Population]
+
+def random_reset_mutation(
+    rng: np.random.Generator,
+    children: Population,
+    mutate_rate: float,
+    alphabet_size: int
+) -> Population:
+    mutate = rng.random(children.shape) < mutate_rate
+    replacements = rng.integers(
+        0, alphabet_size, size=children.shape, dtype=np.uint8
+    )
+    return np.where(mutate, replacements, children)
+
+
+"""Mutate a whole Population, return the mutated group."""
+mutate_group: Mutator = random_reset_mutation
+
+
+def evaluate_group(objective: np.ndarray, individuals: Population) -> Fitness:
+    """Compute the fitness for a population.
     This is the count of shared characters (a string distance metric)."""
-    for i in range(len(objective)):
-        if individual["genome"][i] == objective[i]:
-            individual["fitness"] += 1
-
-
-def evaluate_group(objective: str, individuals: Population) -> None:
-    """Compute and modify the fitness for a population."""
-    for individual in individuals:
-        evaluate_individual(objective, individual)
-
+    return np.count_nonzero(individuals == objective, axis=1)
 
-def rank_group(individuals: Population) -> None:
-    """Sort a population by fitness, highest first."""
-    individuals.sort(key=lambda x: x["fitness"], reverse=True)
 
-
-def parent_select(individuals: Population, number: int) -> Population:
+def parent_select(
+    rng: np.random.Generator,
+    individuals: Population,
+    fitness: Fitness,
+    number: int
+) -> Population:
     """Choose parents in direct probability to their fitness."""
-    weights = [x["fitness"] for x in individuals]
-    if all(w == 0 for w in weights):
-        weights = [1] * len(weights)
-    return random.choices(individuals, k=number, weights=weights)
-
-
-def survivor_select(individuals: Population, pop_size: int) -> Population:
+    total = fitness.sum()
+    if total == 0:
+        weights = None
+    else:
+        weights = fitness / total
+    chosen = rng.choice(len(individuals), size=number, p=weights)
+    return individuals[chosen]
+
+
+def survivor_select(
+    individuals: Population,
+    fitness: Fitness,
+    pop_size: int
+) -> tuple[Population, Fitness]:
     """Picks who gets to live!"""
-    rank_group(individuals)
-    return individuals[:pop_size]
+    # Highest fitness first; ties go to whoever came first.
+    survivors = np.argsort(-fitness, kind="stable")[:pop_size]
+    return individuals[survivors], fitness[survivors]
 
 
 @executor_function
 def evolve(objective: str, pop_size: int=3, fitness_percent: float=1) -> str:
     """A whole EC run, the main driver."""
-    population, alphabet = initialize_pop(objective, pop_size)
-    evaluate_group(objective=objective, individuals=population)
-    rank_group(individuals=population)
-    best_fitness = population[0]["fitness"]
+    rng = np.random.default_rng()
+    population, alphabet = initialize_pop(rng, objective, pop_size)
+    target = encode(objective, alphabet)
+    fitness = evaluate_group(objective=target, individuals=population)
+    population, fitness = survivor_select(population, fitness, pop_size)
+    best_fitness = fitness[0]
     PERFECT_FITNESS = len(objective)
     fitness_goal = PERFECT_FITNESS * fitness_percent
     while best_fitness < fitness_goal:
-        parents = parent_select(individuals=population, number=80)
-        children = recombine_group(parents, recombine_rate=0.8)
+        parents = parent_select(rng, population, fitness, number=80)
+        children = recombine_group(rng, parents, recombine_rate=0.8)
         mutate_rate = ((1 - (best_fitness / PERFECT_FITNESS)) / 5)
-        mutants = mutate_group(children, mutate_rate, alphabet)
-        evaluate_group(objective=objective, individuals=mutants)
-        everyone = population + mutants
-        rank_group(individuals=everyone)
-        population = survivor_select(individuals=everyone, pop_size=pop_size)
-        if best_fitness != population[0]["fitness"]:
-            best_fitness = population[0]["fitness"]
-            # print("Iteration number", counter, "with best individual", population[0])
-            # print("".join(population[0]["genome"]), end="\r")
-            # print("".join(population[0]["genome"]))
-    # print()
-    return population[0]["genome"]
+        mutants = mutate_group(rng, children, mutate_rate, len(alphabet))
+        mutant_fitness = evaluate_group(objective=target, individuals=mutants)
+        population, fitness = survivor_select(
+            np.concatenate((population, mutants)),
+            np.concatenate((fitness, mutant_fitness)),
+            pop_size,
+        )
+        best_fitness = fitness[0]
+    return decode(population[0], alphabet)
 
 
 async def devolve(text: str) -> str: